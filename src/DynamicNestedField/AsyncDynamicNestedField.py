@@ -0,0 +1,476 @@
+import asyncio
+import django
+import inspect
+from collections import OrderedDict
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
+from django.http import Http404
+from django.utils.decorators import classonlymethod
+from rest_framework import status
+from rest_framework.response import Response
+from .DynamicNestedField import (
+    DynamicNestedMixin, NestedModelViewSet, get_request_cache, iscoroutinefunction, markcoroutinefunction
+)
+
+
+class AsyncDynamicNestedMixin(DynamicNestedMixin):
+    """
+    DynamicNestedMixin with an async write path (ais_valid, asave, acreate, aupdate) that uses
+    django async ORM methods, the lookups and writes of independent foreign key and m2m fields
+    run concurrently, and permissions and instance validators can be awaited.
+
+    django rest framework fields are sync, so fields validation runs in one sync_to_async call.
+    """
+
+    @staticmethod
+    async def acall(obj, method, *args, **kwargs):
+        """
+        call the async version of an ORM method (e.g. asave, aadd) if django has it, else run
+        the sync method in a thread.
+        """
+        async_method = getattr(obj, f"a{method}", None)
+        if async_method is not None:
+            return await async_method(*args, **kwargs)
+        return await sync_to_async(getattr(obj, method))(*args, **kwargs)
+
+    @staticmethod
+    async def afetch(queryset):
+        return [obj async for obj in queryset]
+
+    async def ais_valid(self, raise_exception=False):
+        with self.span("format"):
+            self.initial_data_formatter()
+        with self.span("resolve_lookups"):
+            await self.aprefetch_nested_lookups()
+        return await sync_to_async(self.validate_initial_data)()
+
+    async def aprefetch_nested_lookups(self, data_list=None):
+        requested = self.collect_nested_lookups(data_list)
+        results = await asyncio.gather(*[
+            self.afetch(self.get_nested_lookup_queryset(attr, filter_field, values))
+            for (attr, filter_field), values in requested.items()
+        ])
+        self.set_nested_lookups(requested, results)
+
+    async def adata(self):
+        return await sync_to_async(lambda: self.data)()
+
+    async def asave(self, **kwargs):
+        if self.is_atomic_write():  # transaction.atomic() can only be used by sync code.
+            return await sync_to_async(self.save)(**kwargs)
+
+        validated_data = {**self.validated_data, **kwargs}
+
+        if self.instance is not None:
+            self.instance = await self.aupdate(self.instance, validated_data)
+        else:
+            self.instance = await self.acreate(validated_data)
+
+        return self.instance
+
+    async def acheck_permissions(self):
+        """
+        async version of check_permissions, permission classes can define an async has_permission.
+        """
+        request = self.context['request']
+        decisions = get_request_cache(request, "permissions")
+        if type(self) in decisions:  # already permitted in this request.
+            return
+
+        view = self.get_permission_view()
+        for permission in self.get_permissions(request.method):
+            if iscoroutinefunction(permission.has_permission):
+                allowed = await permission.has_permission(request, view)
+            else:
+                allowed = await sync_to_async(permission.has_permission)(request, view)
+            if not allowed:
+                view.permission_denied(
+                    request,
+                    message=getattr(permission, 'message', None),
+                    code=getattr(permission, 'code', None)
+                )
+
+        decisions[type(self)] = True
+
+    async def ainstance_validation(self, instance):
+        request = self.get_request()
+
+        if request is None:
+            raise Exception(
+                f'can not find request in serializer context for "{self.__class__.__name__}" serializer')
+
+        for validator in self.get_instance_validators(request):
+            if hasattr(validator, "avalidate"):
+                instance = await validator.avalidate(instance, request)
+            else:
+                instance = await sync_to_async(validator.validate)(instance, request)
+
+        return instance
+
+    async def awrite_child(self, config, data, instance=None, update=False, attr=None, many=False):
+        """
+        validate nested data with its serializer, then create it (no instance), update it
+        (update=True, the changes are added to the changes of attr) or return the validated instance.
+        """
+        ser = config["serializer"](instance, data=data, partial=self.partial)
+        ser.context["request"] = self.context['request'] if 'request' in self.context else None
+
+        if isinstance(ser, AsyncDynamicNestedMixin):
+            await ser.ais_valid()
+            if instance is None:
+                return await ser.asave()
+            if update:
+                instance = await ser.aupdate(ser.instance, data)
+                self.add_child_changes(attr, ser, many=many)
+                return instance
+            return ser.instance
+
+        def write():
+            if not ser.is_valid():
+                raise Exception(ser.errors)
+            if instance is None:
+                return ser.save()
+            if update:
+                instance = ser.update(ser.instance, data)
+                self.add_child_changes(attr, ser, many=many)
+                return instance
+            return ser.instance
+
+        return await sync_to_async(write)()
+
+    async def afetch_lookups(self, attr, model, filter_field, values, config=None, for_update=False, required=True):
+        if not values:
+            return {}
+        pending = self.get_pending_values(model, filter_field, values, for_update)
+        objs = await self.afetch(self.get_lookup_queryset(model, filter_field, pending, config, for_update)) \
+            if pending else []
+        return self.match_lookups(attr, model, filter_field, values, objs, required, self.is_locking(model, for_update))
+
+    async def aresolve_foreign_keys(self, fields, info, update=False):
+        lookups_by_model = self.collect_foreign_key_lookups(fields, info)
+
+        async def fetch(model, lookups):
+            for_update = self.is_locked_lookup(fields, lookups, update)
+            pending = self.get_pending_foreign_keys(model, lookups, for_update)
+            return await self.afetch(self.get_foreign_key_queryset(model, pending, for_update)) if pending else []
+
+        results = await asyncio.gather(*[fetch(model, lookups) for model, lookups in lookups_by_model.items()])
+        return self.match_foreign_keys(fields, lookups_by_model, results, update)
+
+    async def aget_foreign_keys(self, fields, info, update=False, resolved=None):
+        """
+        async version of create_and_set_foreign_key and update_and_set_foreign_key, returns a dict
+        of {attr: instance} for the foreign key fields, the old data is fetched concurrently (or
+        given as resolved) and the fields are written one after another in the order of the body.
+        """
+        if resolved is None:
+            resolved = await self.aresolve_foreign_keys(fields, info, update=update)
+
+        async def get_instance(attr, value, old_instance):
+            config = self.get_field_config(attr)
+
+            if update and not config['can_be_edited']:
+                raise Exception(f'can not update attribute: "{attr}" when can_be_edited is set to False')
+
+            filter_field = config['filter'][0]
+            if filter_field in value:  # if filter was in the data then we will use old data.
+                if old_instance is None:
+                    raise Exception(
+                        f"no filtered_field equal to ({filter_field}={value[filter_field]}) for attribute: {attr}"
+                    )
+                return await self.awrite_child(config, value, old_instance, update=update, attr=attr)
+
+            if not config['create_new_instance']:
+                raise Exception(f'can not create attribute: "{attr}" when create_new_instance is set to False')
+            return await self.awrite_child(config, value)
+
+        instances = {}
+        for (attr, value), old_instance in zip(fields, resolved):
+            instances[attr] = await get_instance(attr, value, old_instance)
+        return instances
+
+    async def aget_m2m_lookups(self, instance, attr, value, update=False):
+        """
+        fetch the old data of a m2m attribute with one query, returns a {lookup_key: instance} dict.
+        """
+        config = self.get_field_config(attr)
+        filter_field = config['filter'][0]
+        values = [data[filter_field] for data in value if filter_field in data]
+        return await self.afetch_lookups(
+            attr, getattr(instance, attr).model, filter_field, values,
+            config, for_update=update and config.get("select_for_update", False)
+        )
+
+    async def aset_m2m(self, instance, attr, value, update=False, found=None):
+        """
+        async version of create_and_set_m2m and update_and_set_m2m for one attribute, the items are
+        written one after another in the order of the body (found is the result of aget_m2m_lookups).
+        """
+        config = self.get_field_config(attr)
+        field = getattr(instance, attr)  # the field or the attribute that we will update with new data.
+
+        if update and not config['can_be_edited']:
+            raise Exception(f'can not update attribute: "{attr}" when can_be_edited is set to False')
+
+        # clear old data.
+        if config.get("clear_data", False):
+            await self.acall(field, "clear")
+
+        model = field.model
+        filter_field = config['filter'][0]
+        old_data = [data for data in value if filter_field in data]
+
+        if len(old_data) != len(value) and not config['create_new_instance']:
+            raise Exception(f'can not create attribute: "{attr}" when create_new_instance is set to False')
+
+        # get all old data with one query.
+        if found is None:
+            found = await self.aget_m2m_lookups(instance, attr, value, update=update)
+
+        async def get_instance(data):
+            if filter_field not in data:
+                return await self.awrite_child(config, data)
+            ins = found[self.get_lookup_key(model, filter_field, data[filter_field])]
+            # only update old data when the body contains more than the filter value.
+            if update and any(key != filter_field for key in data):
+                return await self.awrite_child(config, data, ins, update=True, attr=attr, many=True)
+            return ins
+
+        instances = [await get_instance(data) for data in value]
+        if instances:
+            await self.acall(field, "add", *instances)
+
+    async def aset_m2m_fields(self, instance, fields, update=False, found=None):
+        """
+        write m2m fields one after another, the old data of all of them is fetched concurrently
+        first (unless given as found), so the created rows follow the order of the body.
+        """
+        if found is None:
+            found = await asyncio.gather(*[
+                self.aget_m2m_lookups(instance, attr, value, update=update) for attr, value in fields
+            ])
+        for (attr, value), lookups in zip(fields, found):
+            await self.aset_m2m(instance, attr, value, update=update, found=lookups)
+
+    async def acreate(self, validated_data):
+        with self.span("create"):
+            return await self.acreate_nested(validated_data)
+
+    async def acreate_nested(self, validated_data):
+        await self.acheck_permissions()
+        info = self.get_nested_plan().info  # information about model data.
+
+        m2m_fields, foreign_key_fields, custom_fields = self.split_create_data(validated_data)
+
+        # get foreign keys before creating the main instance, so it is inserted with one query.
+        relation_fields = [(attr, value) for attr, value in foreign_key_fields
+                           if self.get_field_plan(attr).kind == "relation"]
+        foreign_key_fields = [field for field in foreign_key_fields if field not in relation_fields]
+        validated_data.update(await self.aget_foreign_keys(foreign_key_fields, info))
+
+        instance = await self.Meta.model.objects.acreate(**validated_data)  # create the main instance.
+
+        ins = await self.ainstance_validation(instance)  # instance validation.
+        if ins is None:
+            await self.acall(instance, "delete")
+            raise Exception(f'model instance validation failed for model: {type(instance)}')
+        instance = ins
+
+        await self.aset_m2m_fields(instance, m2m_fields)
+
+        if relation_fields or custom_fields:
+            for attr, ins in (await self.aget_foreign_keys(relation_fields, info)).items():
+                setattr(instance, attr, ins)
+            await sync_to_async(self.create_and_set_custom_fields)(instance, custom_fields, info)
+            await self.acall(instance, "save")
+        self.invalidate_representations(instance)
+
+        return instance
+
+    async def aupdate(self, instance, validated_data):
+        await self.acheck_permissions()  # permission check.
+        info = self.get_nested_plan().info  # information about model data.
+        with self.span("update"):
+            return await self.aupdate_instance(instance, validated_data, info)
+
+    async def aupdate_instance(self, instance, validated_data, info):
+        ins = await self.ainstance_validation(instance)  # instance validation.
+
+        if ins is None:
+            raise Exception(f'model instance validation failed for model: {type(instance)}')
+
+        instance = ins
+        # only the fields changed by this update are saved, and an unchanged instance is not saved.
+        state = self.get_instance_state(instance)
+        self.changes = OrderedDict()
+
+        m2m_fields = []
+        foreign_key_fields = []
+        custom_fields = []
+        for attr, value in validated_data.items():  # loop data to set attribute new data and separate other field.
+            kind = self.get_field_plan(attr).kind
+            if kind == "m2m":  # m2m fields.
+                m2m_fields.append((attr, value))
+            elif kind == "foreign_key":  # foreign key fields.
+                foreign_key_fields.append((attr, value))
+            elif kind == "normal":  # normal fields.
+                setattr(instance, attr, value)
+            else:  # custom fields.
+                custom_fields.append((attr, value))
+
+        # old data of all the fields is fetched concurrently, then the fields are written in order.
+        resolved, *found = await asyncio.gather(
+            self.aresolve_foreign_keys(foreign_key_fields, info, update=True),
+            *[self.aget_m2m_lookups(instance, attr, value, update=True) for attr, value in m2m_fields]
+        )
+        await self.aset_m2m_fields(instance, m2m_fields, update=True, found=found)
+        foreign_keys = await self.aget_foreign_keys(foreign_key_fields, info, update=True, resolved=resolved)
+        for attr, ins in foreign_keys.items():
+            setattr(instance, attr, ins)
+
+        if custom_fields:
+            await sync_to_async(self.update_and_set_custom_fields)(instance, custom_fields, info)
+
+        changed = self.get_state_changes(instance, state)
+        if changed:
+            await self.acall(instance, "save", update_fields=self.get_update_fields(instance, changed))
+        self.changes = self.get_changes_summary(instance, changed, self.changes)
+        self.invalidate_representations(instance)
+
+        return instance
+
+
+class AsyncNestedModelViewSet(NestedModelViewSet):
+    """
+    NestedModelViewSet that handles requests as a coroutine under ASGI, create and update use
+    the async write path of AsyncDynamicNestedMixin serializers, the other actions (and
+    serializers that are not async) run the sync actions in one sync_to_async call.
+    """
+
+    @classonlymethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        return markcoroutinefunction(view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.inject_query_params_in_req(request)
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers  # deprecate?
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            # Get the appropriate handler method
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    def is_async_serializer(self):
+        serializer_class = self.get_serializer_class()
+        return isinstance(serializer_class, type) and issubclass(serializer_class, AsyncDynamicNestedMixin)
+
+    async def aget_object(self):
+        """
+        async version of get_object that fetches the instance with queryset.aget().
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+
+        assert lookup_url_kwarg in self.kwargs, (
+            'Expected view %s to be called with a URL keyword argument '
+            'named "%s". Fix your URL conf, or set the `.lookup_field` '
+            'attribute on the view correctly.' %
+            (self.__class__.__name__, lookup_url_kwarg)
+        )
+
+        filter_kwargs = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        try:
+            obj = await queryset.aget(**filter_kwargs)
+        except (ObjectDoesNotExist, TypeError, ValueError, DjangoValidationError):
+            raise Http404
+
+        await sync_to_async(self.check_object_permissions)(self.request, obj)
+        return obj
+
+    async def list(self, request, *args, **kwargs):
+        return await sync_to_async(super().list)(request, *args, **kwargs)
+
+    def get_streaming_response(self, serializer):
+        response = super().get_streaming_response(serializer)
+        if django.VERSION >= (4, 2):  # django reads sync iterators into memory under ASGI.
+            response.streaming_content = self.aiter_content(
+                response.streaming_content, getattr(self, "stream_chunk_size", 2000)
+            )
+        return response
+
+    @staticmethod
+    async def aiter_content(content, chunk_size):
+        """
+        read the streaming content in a thread (one chunk of rows at a time) as an async iterator.
+        """
+        content = iter(content)
+        read_chunk = sync_to_async(lambda: b"".join(islice(content, chunk_size)))
+        while True:
+            chunk = await read_chunk()
+            if not chunk:
+                break
+            yield chunk
+
+    async def retrieve(self, request, *args, **kwargs):
+        return await sync_to_async(super().retrieve)(request, *args, **kwargs)
+
+    async def destroy(self, request, *args, **kwargs):
+        return await sync_to_async(super().destroy)(request, *args, **kwargs)
+
+    async def create(self, request, *args, **kwargs):
+        if not self.is_async_serializer():
+            return await sync_to_async(super().create)(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        await serializer.ais_valid(raise_exception=True)
+        await self.aperform_create(serializer)
+        data = await serializer.adata()
+        headers = self.get_success_headers(data)
+        return Response(data, status=status.HTTP_201_CREATED, headers=headers)
+
+    async def aperform_create(self, serializer):
+        await serializer.asave()
+
+    async def update(self, request, *args, **kwargs):
+        if not self.is_async_serializer():
+            return await sync_to_async(super().update)(request, *args, **kwargs)
+
+        partial = kwargs.pop('partial', False)
+        instance = await self.aget_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        await serializer.ais_valid(raise_exception=True)
+        await self.aperform_update(serializer)
+
+        if getattr(instance, '_prefetched_objects_cache', None):
+            # If 'prefetch_related' has been applied to a queryset, we need to
+            # forcibly invalidate the prefetch cache on the instance.
+            instance._prefetched_objects_cache = {}
+
+        return Response(await serializer.adata())
+
+    async def aperform_update(self, serializer):
+        await serializer.asave()
+
+    async def partial_update(self, request, *args, **kwargs):
+        kwargs['partial'] = True
+        return await self.update(request, *args, **kwargs)
@@ -1,17 +1,36 @@
+import asyncio
+import contextlib
+import contextvars
+import copy
+import datetime
+import hashlib
+import logging
+import time
 import warnings
 import django_filters
 import threading
-from collections import OrderedDict
+from asgiref.sync import sync_to_async
+from collections import OrderedDict, namedtuple
+from itertools import islice
 from collections.abc import Mapping
-from django.core.exceptions import ValidationError as DjangoValidationError
-from django.db import models
+from types import MappingProxyType
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db import DEFAULT_DB_ALIAS, connections, models, router, transaction
+from django.db.models import DEFERRED, Count, Max, Prefetch, Q
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django_restql.mixins import DynamicFieldsMixin, QueryArgumentsMixin
+from django_restql.parser import Query
 from django_filters import compat
-from rest_framework import serializers, viewsets
+from rest_framework import generics, renderers, serializers, viewsets
 from rest_framework.fields import get_error_detail, set_value
 from rest_framework.fields import SkipField
 from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.relations import PKOnlyObject
+from rest_framework.response import Response
 from rest_framework.serializers import ListSerializer, BaseSerializer
 from rest_framework.settings import api_settings
 from rest_framework.utils import model_meta
@@ -19,13 +38,132 @@ from rest_framework.validators import UniqueValidator
 from rest_framework.fields import empty
 from .DjangoModelsFields import fields as filtered_fields
 
+try:
+    from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+except ImportError:  # asgiref < 3.6
+    from asyncio import iscoroutinefunction
 
-_requests = {}
+    def markcoroutinefunction(func):
+        func._is_coroutine = asyncio.coroutines._is_coroutine
+        return func
+
+
+# the request of the current thread or async task, set by GlobalRequestMiddleware.
+_request = contextvars.ContextVar("DynamicNestedField_request", default=None)
+
+# None outside atomic writes, False inside an atomic write and True while the nested fields of an
+# atomic write are written inside their level savepoint.
+_write_level = contextvars.ContextVar("DynamicNestedField_write_level", default=None)
+
+# the sink of the instrumentation spans (see set_instrumentation_sink), None disables them.
+_instrumentation_sink = None
+_no_span = contextlib.nullcontext()
+
+# the cache aliases of the serializers with a shared representation cache, used to invalidate
+# the cached representations of an instance whatever serializer writes it.
+_representation_cache_aliases = set()
+
+# the cache keys of the instances represented inside the representation that is being cached.
+_representation_dependencies = contextvars.ContextVar("DynamicNestedField_representation_dependencies", default=None)
+
+# compiled, read-only metadata of a DynamicNestedMixin serializer class (see DynamicNestedMixin.get_nested_plan).
+NestedPlan = namedtuple("NestedPlan", ["info", "fields"])
+NestedFieldPlan = namedtuple("NestedFieldPlan", ["config", "kind", "related_model", "serializer", "is_dnm", "drop"])
 
 
 class DynamicNestedListSerializer(serializers.ListSerializer):
+    changes = None  # summaries of the items changed by the last update.
+
+    def is_valid(self, raise_exception=False):
+        if not isinstance(self.child, DynamicNestedMixin):
+            return super().is_valid(raise_exception=raise_exception)
+
+        if isinstance(self.initial_data, list):
+            self.child.list_initial_data_formatter(self.initial_data)
+
+        with self.child.span("validate", many=True):
+            res = super().is_valid(raise_exception=False)
+
+        if not res:
+            raise Exception(self.errors)
+
+        return res
+
+    def create(self, validated_data):
+        """
+        create all the items with one permission check, new instances are inserted with
+        bulk_create and the m2m relations of all items are inserted together.
+        """
+        if not isinstance(self.child, DynamicNestedMixin):
+            return super().create(validated_data)
+
+        self.child.check_permissions()
+        info = self.child.get_nested_plan().info
+        with self.child.span("create", many=True), self.child.write_atomic():
+            return self.create_instances(validated_data, info)
+
+    def create_instances(self, validated_data, info):
+        child = self.child
+        model = child.Meta.model
+
+        items = [(data, *child.split_create_data(data)) for data in validated_data]
+
+        # resolve foreign keys of all items together and set them before inserting the instances.
+        resolved = iter(child.resolve_foreign_keys([field for item in items for field in item[2]], info))
+        instances = []
+        for data, m2m_fields, foreign_key_fields, custom_fields in items:
+            instance = model(**data)
+            child.create_and_set_foreign_key(
+                instance, foreign_key_fields, info, resolved=[next(resolved) for _ in foreign_key_fields]
+            )
+            instances.append(instance)
+
+        if child.can_bulk_create(model):
+            instances = model.objects.bulk_create(instances)
+        else:
+            for instance in instances:
+                instance.save(force_insert=True)
+
+        validated = [child.instance_validation(instance) for instance in instances]  # instance validation.
+        if any(instance is None for instance in validated):
+            model.objects.filter(pk__in=[instance.pk for instance in instances]).delete()
+            raise Exception(f'model instance validation failed for model: {model}')
+
+        child.bulk_create_and_set_m2m(validated, [item[1] for item in items], info)
+        for instance, item in zip(validated, items):
+            child.create_and_set_custom_fields(instance, item[3], info)
+
+        return validated
+
     def update(self, instance, validated_data):
-        return super().update(instance, validated_data)
+        """
+        update the instances that match the items ids and create the rest, the permissions
+        are checked once for all items.
+        """
+        if not isinstance(self.child, DynamicNestedMixin):
+            return super().update(instance, validated_data)
+
+        self.child.check_permissions()
+        info = self.child.get_nested_plan().info
+        instances = {obj.pk: obj for obj in instance}
+
+        res = []
+        new_data = []
+        self.changes = []  # summary of the changes of every updated item.
+        with self.child.span("update", many=True), self.child.write_atomic():
+            for data in validated_data:
+                obj = instances.get(data.get("id", None))
+                if obj is None:
+                    new_data.append(data)
+                else:
+                    res.append(self.child.update_instance(obj, data, info))
+                    if self.child.changes:
+                        self.changes.append(OrderedDict(id=obj.pk, **self.child.changes))
+
+            if new_data:
+                res.extend(self.create_instances(new_data, info))
+
+        return res
 
     def to_representation(self, data):
         """
@@ -35,14 +173,51 @@ class DynamicNestedListSerializer(serializers.ListSerializer):
         # so, first get a queryset from the Manager if needed
         iterable = data.all() if isinstance(data, models.Manager) else data
 
-        res = []
-        for item in iterable:
-            value = self.child.to_representation(item)
-            if value:
-                res.append(value)
+        # validate the instances of the list together, so validators with a validate_many
+        # batch hook run once per list instead of once per row.
+        if not isinstance(self.child, DynamicNestedMixin):
+            return [value for value in (self.child.to_representation(item) for item in iterable) if value]
+
+        with self.child.span("representation", many=True):
+            if not self.child.dynamic_fields_mixin_kwargs["return_pk"]:
+                iterable = list(iterable)
+                self.child.batch_instance_validation(iterable)
+
+            res = []
+            for item in iterable:
+                value = self.child.to_representation(item)
+                if value:
+                    res.append(value)
 
         return res
 
+    def iter_representation(self, data, chunk_size=2000):
+        """
+        yield the representation of the items one by one, querysets are read with
+        iterator(chunk_size) (prefetch_related lookups run for each chunk), so only one
+        chunk of instances is kept in memory.
+        """
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        if isinstance(iterable, models.QuerySet):
+            iterable = iterable.iterator(chunk_size=chunk_size)
+        iterable = iter(iterable)
+
+        is_dnm = isinstance(self.child, DynamicNestedMixin) and not self.child.dynamic_fields_mixin_kwargs["return_pk"]
+        while True:
+            chunk = list(islice(iterable, chunk_size))
+            if not chunk:
+                break
+            if is_dnm:
+                self.child.batch_instance_validation(chunk)
+            for item in chunk:
+                value = self.child.to_representation(item)
+                if value:
+                    yield value
+            if is_dnm and self.child.get_request() is not None:
+                # don't keep the validated instances and the cached representations of old chunks in memory.
+                for name in ("instance_validation", "representations", "representation_dependents"):
+                    get_request_cache(self.child.get_request(), name).clear()
+
 
 class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
@@ -55,6 +230,21 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
         permission_classes_by_method = {}
         instance_validator = []
 
+    DNM_default_config = {
+        "field": {
+            "create_new_instance": True,  # default: True
+            "can_be_edited": True,        # default: True
+            "clear_data": False,          # default: False
+            "filter": [None],             # default: None
+            "serializer": None,           # default: None
+            "bulk_write": False,          # default: False
+            "only_fields": False,         # default: False
+            "select_for_update": False    # default: False
+        }
+    }
+
+    changes = None  # summary of the last update (see get_changes_summary).
+
     def __init__(self, instance=None, data=empty, request=None, **kwargs):
         # check if 'list_serializer_class' was declared in Meta class if not set our default list serializer.
         if "list_serializer_class" not in self.Meta.__dict__:
@@ -65,100 +255,471 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
         # if instance is not None:
         #     self.instance_validation(instance)
 
+    @classmethod
+    def get_nested_plan(cls):
+        """
+        return the nested plan of this serializer class, it is built once from Meta and the
+        declared fields and cached on the class, so requests don't have to compute the model
+        field info, fill DNM_config defaults or find nested serializers again.
+        """
+        plan = cls.__dict__.get("_nested_plan")
+        if plan is None:
+            plan = cls.build_nested_plan()
+            cls._nested_plan = plan
+        return plan
+
+    @classmethod
+    def build_nested_plan(cls):
+        info = GenericFilterSet.get_model_info(cls.Meta.model)
+        DNM_config = getattr(cls.Meta, "DNM_config", {})
+        attrs = [*info.fields_and_pk, *info.relations, *cls._declared_fields, *DNM_config]
+
+        fields = {}
+        for attr in OrderedDict.fromkeys(attrs):
+            if attr == "pk":
+                continue
+            # complete missing configurations.
+            config = {**cls.DNM_default_config["field"], **DNM_config.get(attr, {})}
+            if isinstance(config["filter"], str):
+                config["filter"] = [config["filter"]]
+
+            # find nested serializers.
+            field = cls._declared_fields.get(attr)
+            drop = False
+            if config["serializer"] is None and field is not None:
+                config["serializer"] = type(field) if isinstance(field, serializers.ModelSerializer) \
+                    else type(field.child) if isinstance(field, ListSerializer) \
+                    and isinstance(field.child, serializers.ModelSerializer) else None
+                drop = config["serializer"] is None and isinstance(field, BaseSerializer)
+
+            relation = info.relations.get(attr)
+            if relation is not None and relation.to_many:
+                kind = "m2m"
+            elif relation is not None and relation.to_field is not None:
+                kind = "foreign_key"
+            elif relation is not None:
+                kind = "relation"
+            elif attr in info.fields:
+                kind = "normal"
+            else:
+                kind = "custom"
+
+            serializer = config["serializer"]
+            fields[attr] = NestedFieldPlan(
+                config=MappingProxyType(config),
+                kind=kind,
+                related_model=relation.related_model if relation is not None else None,
+                serializer=serializer,
+                is_dnm=isinstance(serializer, type) and issubclass(serializer, DynamicNestedMixin),
+                drop=drop,
+            )
+
+        return NestedPlan(info=info, fields=MappingProxyType(fields))
+
+    def get_field_plan(self, attr):
+        plan = self.get_nested_plan().fields.get(attr)
+        if plan is None:  # attributes that are not model or serializer fields.
+            plan = NestedFieldPlan(
+                MappingProxyType(dict(self.DNM_default_config["field"])), "custom", None, None, False, False
+            )
+        return plan
+
+    def get_field_config(self, attr):
+        return self.get_field_plan(attr).config
+
     def is_valid(self, raise_exception=False):
-        DNM_config = {
-            "field": {
-                "create_new_instance": True,  # default: True
-                "can_be_edited": True,        # default: True
-                "clear_data": False,          # default: False
-                "filter": [None],             # default: None
-                "serializer": None            # default: None
-            }
-        }
+        with self.span("format"):
+            self.initial_data_formatter()
+        with self.span("resolve_lookups"):
+            self.prefetch_nested_lookups()
+        return self.validate_initial_data()
 
-        self.initial_data_formatter(DNM_config)
-        self.nested_initial_data_formatter()
-        self.removeNoneValues(self.initial_data)
+    def validate_initial_data(self):
+        """
+        the rest of is_valid() after formatting initial_data and prefetching the nested lookups.
+        """
+        with self.span("normalize"):
+            self.normalize_initial_data(self.initial_data)
 
-        res = serializers.ModelSerializer.is_valid(self, raise_exception=False)
+        with self.span("validate"):
+            res = serializers.ModelSerializer.is_valid(self, raise_exception=False)
 
         if not res:
             raise Exception(self.errors)
 
         return res
 
-    def nested_initial_data_formatter(self):  # check if filter_field in the model before use.
-        info = model_meta.get_field_info(self.Meta.model)
-        temp_initial_data = [i for i in self.initial_data.items()]
-        for attr, value in temp_initial_data:
-            if attr in self.Meta.DNM_config:
-                config = self.Meta.DNM_config[attr]
-                # attribute is Many2Many:
-                if attr in info.relations and info.relations[attr].to_many and config["serializer"] is not None:
-                    for i, v in enumerate(value):
-                        res = None
-                        request_contains_filter = config["filter"][0] in v if isinstance(v, dict) else False
-                        request_contains_id = "id" in v if isinstance(v, dict) else False
-                        if isinstance(config["serializer"](), DynamicNestedMixin):  # DNM Serializer
-                            # ids.
-                            if not isinstance(v, dict):
-                                res = self.DNM_ids_validator(attr, v)
-                            # data with ids.
-                            elif isinstance(v, dict) and request_contains_filter:
-                                res = self.DNM_data_with_ids_validator(attr, v)
-                            # just data.
-                            elif isinstance(v, dict):
-                                res = self.data_validator(attr, v)
-                        else:  # Not DNM Serializer
-                            # ids.
-                            if not isinstance(v, dict):
-                                res = self.ids_validator(attr, v)
-                            # data with ids.
-                            elif isinstance(v, dict) and request_contains_id:
-                                res = self.data_with_ids_validator(attr, v)
-                            # just data.
-                            elif isinstance(v, dict):
-                                res = self.data_validator(attr, v)
-                        self.reformat(attr, res, is_many=True, i=i)
-                # attribute is ForeignKey:
-                elif attr in info.relations and info.relations[attr].to_field is not None and config["serializer"]:
-                    res = None
-                    request_contains_filter = config["filter"][0] in value if isinstance(value, dict) else False
-                    request_contains_id = "id" in value if isinstance(value, dict) else False
-                    if isinstance(config["serializer"](), DynamicNestedMixin):  # DNM Serializer
-                        if isinstance(value, (int, str, bool, float)):
-                            res = self.DNM_ids_validator(attr, value)
-                        elif isinstance(value, dict) and request_contains_filter:
-                            res = self.DNM_data_with_ids_validator(attr, value)
-                        elif isinstance(value, dict):
-                            res = self.data_validator(attr, value)
+    def list_initial_data_formatter(self, data_list):
+        """
+        format every item of a many=True payload the same way is_valid() formats a single
+        item, the nested lookups of all items are fetched together.
+        """
+        data_list = [data for data in data_list if isinstance(data, dict)]
+        for data in data_list:
+            self.initial_data = data
+            self.initial_data_formatter()
+        self.prefetch_nested_lookups(data_list)
+        for data in data_list:
+            self.normalize_initial_data(data)
+        del self.initial_data
+
+    def nested_initial_data_formatter(self, prefetch=True):  # check if filter_field in the model before use.
+        if prefetch:
+            self.prefetch_nested_lookups()
+        self.normalize_initial_data(self.initial_data)
+
+    def normalize_initial_data(self, data):
+        """
+        normalize initial data in place with one walk over it (after the nested lookups are fetched),
+        None values are removed and the values of nested attributes are replaced with their
+        validated data, lists are compacted in place and nothing is copied.
+        """
+        dropped = []
+        for attr, value in data.items():
+            if value is None:
+                dropped.append(attr)
+                continue
+            plan = self.get_field_plan(attr)
+            # attribute is Many2Many:
+            if plan.kind == "m2m" and plan.serializer is not None and isinstance(value, list):
+                with self.span("validate_nested", attr):
+                    size = 0
+                    for v in value:
+                        res = self.validate_nested_value(attr, v, many=True) if v is not None else None
+                        if res is not None:
+                            value[size] = remove_none_values(res)
+                            size += 1
+                    del value[size:]
+            # attribute is ForeignKey:
+            elif plan.kind == "foreign_key" and plan.serializer:
+                with self.span("validate_nested", attr):
+                    res = self.validate_nested_value(attr, value)
+                if res is not None:
+                    data[attr] = remove_none_values(res)
+                else:
+                    dropped.append(attr)
+            # attribute is Normal or CustomField:
+            else:
+                remove_none_values(value)
+
+        for attr in dropped:
+            data.pop(attr)
+
+        return data
+
+    def validate_nested_value(self, attr, value, many=False):
+        """
+        validate one value of a nested attribute (ids, data with ids or just data) and return the
+        value that replaces it in initial data, or None to remove it.
+        """
+        plan = self.get_field_plan(attr)
+        is_data = isinstance(value, dict)
+        is_id = not is_data if many else isinstance(value, (int, str, bool, float))
+        if plan.is_dnm:  # DNM Serializer
+            if is_id:  # ids.
+                return self.DNM_ids_validator(attr, value)
+            if is_data and plan.config["filter"][0] in value:  # data with ids.
+                return self.DNM_data_with_ids_validator(attr, value)
+        else:  # Not DNM Serializer
+            if is_id:  # ids.
+                return self.ids_validator(attr, value)
+            if is_data and "id" in value:  # data with ids.
+                return self.data_with_ids_validator(attr, value)
+        if is_data:  # just data.
+            return self.data_validator(attr, value)
+        return None
+
+    def prefetch_nested_lookups(self, data_list=None):
+        """
+        collect every filter value used by the nested attributes of initial_data (or of every
+        item in data_list) and fetch them with one query per (attribute, filter field), the
+        validators then use the prefetched instances instead of querying the database for each value.
+        values already loaded in this request (see get_identity_map) are not fetched again.
+        """
+        requested = self.collect_nested_lookups(data_list)
+        querysets = [self.get_nested_lookup_queryset(attr, filter_field, values)
+                     for (attr, filter_field), values in requested.items()]
+        self.set_nested_lookups(requested, [list(queryset) for queryset in querysets])
+
+    def collect_nested_lookups(self, data_list=None):
+        requested = OrderedDict()  # {(attr, filter_field): {lookup_key: (value, required)}}
+        data_list = [self.initial_data] if data_list is None else data_list
+        for attr, value in [item for data in data_list for item in data.items()]:
+            plan = self.get_field_plan(attr)
+            config = plan.config
+            if plan.serializer is None:
+                continue
+            if plan.kind == "m2m":
+                values = value if isinstance(value, list) else []
+            elif plan.kind == "foreign_key":
+                values = [value]
+            else:
+                continue
+            model = config["serializer"].Meta.model
+            filters = config["filter"]
+            primary = filters[0] if plan.is_dnm else "id"
+            secondary = filters[1] if len(filters) >= 2 else None
+            for v in values:
+                if isinstance(v, dict):
+                    if primary is not None and primary in v:
+                        filter_field, filter_value, required = primary, v[primary], True
+                    elif secondary is not None and secondary in v:
+                        filter_field, filter_value, required = secondary, v[secondary], False
                     else:
-                        if isinstance(value, (int, str, bool, float)):
-                            res = self.ids_validator(attr, value)
-                        elif isinstance(value, dict) and request_contains_id:
-                            res = self.data_with_ids_validator(attr, value)
-                        elif isinstance(value, dict):
-                            res = self.data_validator(attr, value)
-                    self.reformat(attr, res)
-                # attribute is Normal:
-                elif attr in info.fields_and_pk:
-                    pass
-                # attribute is CustomField:
+                        continue
+                elif primary is not None:
+                    filter_field, filter_value, required = primary, v, True
                 else:
-                    pass
+                    continue
+                if not isinstance(filter_value, (int, str, bool, float)):
+                    continue
+                key = self.get_lookup_key(model, filter_field, filter_value)
+                requested.setdefault((attr, filter_field), OrderedDict())[key] = (filter_value, required)
+        return requested
+
+    def get_nested_lookup_queryset(self, attr, filter_field, values):
+        """
+        return the queryset of the pending values of a nested attribute, with the query plan of
+        its serializer (select_related and prefetch_related), as the ids validators represent the
+        fetched instances with it and their nested fields must not be loaded one by one.
+        """
+        config = self.get_field_config(attr)
+        serializer = config["serializer"]
+        model = serializer.Meta.model
+        pending = self.get_pending_values(model, filter_field, [v for v, _ in values.values()])
+        queryset = self.get_lookup_queryset(model, filter_field, pending, config)
+        if isinstance(serializer, type) and issubclass(serializer, DynamicNestedMixin):
+            select_related, prefetch_related = serializer.get_query_plan()
+            if select_related:
+                queryset = queryset.select_related(*select_related)
+            if prefetch_related:
+                queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+    def set_nested_lookups(self, requested, results):
+        """
+        save the fetched instances (results, in the same order of requested) to be used by the
+        validators and raise one exception for all required values that were not found.
+        """
+        self._nested_lookups = {}
+        missing = OrderedDict()
+        for ((attr, filter_field), values), objs in zip(requested.items(), results):
+            model = self.get_field_config(attr)["serializer"].Meta.model
+            self.map_instances(model, objs, [filter_field])
+            found = self.get_mapped_instances(model, filter_field, values.keys())
+            self._nested_lookups[(attr, filter_field)] = found
+            not_found = [v for key, (v, required) in values.items() if required and key not in found]
+            if not_found:
+                missing[attr] = self.get_lookup_error(attr, filter_field, not_found)
+
+        if missing:
+            raise Exception(missing)
+
+    @staticmethod
+    def get_lookup_key(model, filter_field, value):
+        """
+        convert a filter value from the request body to the python type of the model field,
+        so "1" and 1 will point to the same prefetched instance.
+        """
+        try:
+            field = model._meta.pk if filter_field == "pk" else model._meta.get_field(filter_field)
+            return field.to_python(value)
+        except (FieldDoesNotExist, DjangoValidationError, AttributeError):
+            return value
+
+    @staticmethod
+    def get_instance_lookup_key(instance, filter_field):
+        try:
+            opts = instance._meta
+            field = opts.pk if filter_field == "pk" else opts.get_field(filter_field)
+            return field.value_from_object(instance)
+        except (FieldDoesNotExist, AttributeError):
+            return getattr(instance, filter_field, None)
+
+    def get_identity_map(self):
+        """
+        return the identity map of the request, a {(model, filter field, lookup key): instance}
+        dict shared by the validation and the write of the whole payload tree, so each row is
+        loaded once and the same python object is used everywhere in the request.
+        """
+        request = self.get_request()
+        if request is None:
+            return self.__dict__.setdefault("_identity_map", {})
+        return get_request_cache(request, "identity_map")
+
+    @staticmethod
+    def get_identity_key(model, filter_field, key):
+        opts = model._meta
+        return opts.concrete_model, "pk" if filter_field == opts.pk.name else filter_field, key
+
+    def map_instances(self, model, objs, filter_fields, locked=False):
+        """
+        add fetched instances to the identity map (by pk and by every filter field), rows that
+        were already loaded in the request keep their first instance, which is refreshed with
+        the values of the fetched row when it was locked with select_for_update().
+        """
+        identity_map = self.get_identity_map()
+        for obj in objs:
+            keys = [self.get_identity_key(model, ff, self.get_instance_lookup_key(obj, ff)) for ff in filter_fields]
+            mapped = identity_map.setdefault(self.get_identity_key(model, "pk", obj.pk), obj)
+            if locked and mapped is not obj:
+                self.refresh_mapped_instance(mapped, obj)
+            for key in keys:
+                if locked:
+                    identity_map[key] = mapped
+                else:
+                    identity_map.setdefault(key, mapped)
+            self.map_related_instances(mapped)
+
+    @staticmethod
+    def refresh_mapped_instance(instance, fresh):
+        """
+        copy the field values loaded in fresh (the locked row) to the instance of the identity map,
+        so the references to it see the locked data, changed foreign keys drop their cached instance.
+        """
+        deferred = fresh.get_deferred_fields()
+        for field in instance._meta.concrete_fields:
+            if field.attname in deferred:
+                continue
+            value = fresh.__dict__[field.attname]
+            if field.is_relation and field.is_cached(instance) and instance.__dict__.get(field.attname) != value:
+                field.delete_cached_value(instance)
+            instance.__dict__[field.attname] = value
+
+    def map_related_instances(self, instance):
+        """
+        add the related instances loaded with an instance (with select_related or prefetch_related,
+        at any depth) to the identity map by pk, so later lookups of these rows don't query them again.
+        """
+        identity_map = self.get_identity_map()
+        stack = [instance]
+        while stack:
+            instance = stack.pop()
+            related = [obj for obj in instance._state.fields_cache.values() if isinstance(obj, models.Model)]
+            for cache in getattr(instance, "_prefetched_objects_cache", {}).values():
+                related.extend((cache._result_cache or []) if isinstance(cache, models.QuerySet) else cache)
+            for obj in related:
+                if obj.pk is None:
+                    continue
+                key = self.get_identity_key(type(obj), "pk", obj.pk)
+                if key not in identity_map:
+                    identity_map[key] = obj
+                    stack.append(obj)
+
+    def get_mapped_instances(self, model, filter_field, keys):
+        """
+        return a {lookup_key: instance} dict of the lookup keys found in the identity map.
+        """
+        identity_map = self.get_identity_map()
+        found = {}
+        for key in keys:
+            obj = identity_map.get(self.get_identity_key(model, filter_field, key))
+            if obj is not None:
+                found[key] = obj
+        return found
+
+    def get_pending_values(self, model, filter_field, values, for_update=False):
+        """
+        return the filter values that are not in the identity map, all of them if the rows must
+        be locked with select_for_update().
+        """
+        if self.is_locking(model, for_update):
+            return list(values)
+        identity_map = self.get_identity_map()
+        return [
+            value for value in values
+            if self.get_identity_key(model, filter_field, self.get_lookup_key(model, filter_field, value))
+            not in identity_map
+        ]
+
+    @staticmethod
+    def is_locking(model, for_update=False):
+        return for_update and connections[router.db_for_write(model)].in_atomic_block
+
+    def get_nested_instance(self, attr, filter_field, value, model):
+        """
+        return the instance of model that matches filter_field=value, prefetched instances
+        are used when available else the database is queried, returns None if not found.
+        """
+        lookups = getattr(self, "_nested_lookups", {}).get((attr, filter_field))
+        if lookups is not None:
+            try:
+                key = self.get_lookup_key(model, filter_field, value)
+                if key in lookups:
+                    return lookups[key]
+            except TypeError:  # unhashable filter value.
+                pass
+        found = self.fetch_lookups(attr, model, filter_field, [value], required=False)
+        return found.get(self.get_lookup_key(model, filter_field, value))
+
+    def get_lookup_queryset(self, model, filter_field, values, config=None, for_update=False):
+        """
+        return the queryset of the model instances with filter_field in values, when "only_fields"
+        is set in the field config only the fields used by its serializer are loaded, and with
+        for_update=True the rows are locked with select_for_update() if a transaction is running.
+        """
+        queryset = model.objects.filter(**{f"{filter_field}__in": list(values)})
+        if config is not None and config.get("only_fields", False):
+            serializer = config["serializer"]
+            only_fields = serializer.get_only_fields() if hasattr(serializer, "get_only_fields") else None
+            if only_fields:
+                queryset = queryset.only(*only_fields, filter_field)
+        if self.is_locking(model, for_update):
+            queryset = queryset.select_for_update()
+        return queryset
+
+    def fetch_lookups(self, attr, model, filter_field, values, config=None, for_update=False, required=True):
+        """
+        fetch the model instances of all the filter values with one query and return them as a
+        {lookup_key: instance} dict, one exception is raised for all the values that were not found.
+        values already in the identity map are not fetched again.
+        """
+        if not values:
+            return {}
+        pending = self.get_pending_values(model, filter_field, values, for_update)
+        objs = self.get_lookup_queryset(model, filter_field, pending, config, for_update) if pending else []
+        return self.match_lookups(attr, model, filter_field, values, objs, required, self.is_locking(model, for_update))
+
+    def match_lookups(self, attr, model, filter_field, values, objs, required=True, locked=False):
+        self.map_instances(model, objs, [filter_field], locked)
+        found = self.get_mapped_instances(
+            model, filter_field, [self.get_lookup_key(model, filter_field, v) for v in values]
+        )
+
+        if required:
+            not_found = [v for v in values if self.get_lookup_key(model, filter_field, v) not in found]
+            if not_found:
+                raise Exception(OrderedDict([(attr, self.get_lookup_error(attr, filter_field, not_found))]))
+        return found
+
+    @staticmethod
+    def get_lookup_error(attr, filter_field, values):
+        return f'no {filter_field} with value of ({", ".join(str(v) for v in values)}) for attribute: {attr}'
+
+    def get_representation_serializer(self, serializer_class):
+        """
+        return a serializer used to represent nested instances, one serializer is created for
+        each serializer class in a request (it has no state when it only represents instances).
+        """
+        request = self.get_request()
+        if request is None:
+            return serializer_class()
+
+        representation_serializers = get_request_cache(request, "representation_serializers")
+        if serializer_class not in representation_serializers:
+            representation_serializers[serializer_class] = serializer_class()
+        return representation_serializers[serializer_class]
 
     def DNM_ids_validator(self, attr, value):
-        if self.Meta.DNM_config[attr]["filter"][0] is not None:
-            filter_field = self.Meta.DNM_config[attr]["filter"][0]
-            model_serializer = self.Meta.DNM_config[attr]["serializer"]
+        if self.get_field_config(attr)["filter"][0] is not None:
+            filter_field = self.get_field_config(attr)["filter"][0]
+            model_serializer = self.get_field_config(attr)["serializer"]
             model = model_serializer.Meta.model
             res = None
             if model_serializer is not None:
-                model_filter = model.objects.filter(**{filter_field: value})
-                if model_filter is not None and model_filter.exists():
-                    model_filter = model_filter[0]
-                    ser = model_serializer(model_filter)
-                    res = ser.data
+                model_filter = self.get_nested_instance(attr, filter_field, value, model)
+                if model_filter is not None:
+                    res = self.get_representation_serializer(model_serializer).to_representation(model_filter)
                 else:
                     raise Exception(f'no {filter_field} with value of "{value}" for attribute: {attr}')
             else:
@@ -169,30 +730,27 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
         return res
 
     def ids_validator(self, attr, value):
-        model_serializer = self.Meta.DNM_config[attr]["serializer"]
+        model_serializer = self.get_field_config(attr)["serializer"]
         model = model_serializer.Meta.model
         res = None
-        model_filter = model.objects.filter(**{"id": value})
-        if model_filter is not None and model_filter.exists():
-            model_filter = model_filter[0]
-            ser = model_serializer(model_filter)
-            res = ser.data
+        model_filter = self.get_nested_instance(attr, "id", value, model)
+        if model_filter is not None:
+            res = self.get_representation_serializer(model_serializer).to_representation(model_filter)
         else:
             raise Exception(f"no 'id' with value of ({value}) for attribute: {attr}")
 
         return res
 
     def DNM_data_with_ids_validator(self, attr, value):
-        if self.Meta.DNM_config[attr]["filter"][0] is not None:
-            filter_field = self.Meta.DNM_config[attr]["filter"][0]
-            model_serializer = self.Meta.DNM_config[attr]["serializer"]
+        if self.get_field_config(attr)["filter"][0] is not None:
+            filter_field = self.get_field_config(attr)["filter"][0]
+            model_serializer = self.get_field_config(attr)["serializer"]
             model = model_serializer.Meta.model
             res = None
             if model_serializer is not None:
                 if filter_field in value:
-                    model_filter = model.objects.filter(**{filter_field: value[filter_field]})
-                    if model_filter.exists():
-                        model_filter = model_filter[0]
+                    model_filter = self.get_nested_instance(attr, filter_field, value[filter_field], model)
+                    if model_filter is not None:
                         value["id"] = model_filter.id
                         ser = model_serializer(model_filter, data=value, partial=self.partial)
                         ser.context["request"] = self.context['request'] if 'request' in self.context else None
@@ -214,13 +772,12 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
         return res
 
     def data_with_ids_validator(self, attr, value):
-        model_serializer = self.Meta.DNM_config[attr]["serializer"]
+        model_serializer = self.get_field_config(attr)["serializer"]
         model = model_serializer.Meta.model
         res = None
         if "id" in value.keys():
-            model_filter = model.objects.filter(**{"id": value["id"]})
-            if model_filter is not None and model_filter.exists():
-                model_filter = model_filter[0]
+            model_filter = self.get_nested_instance(attr, "id", value["id"], model)
+            if model_filter is not None:
                 value["id"] = model_filter.id
                 ser = model_serializer(model_filter, data=value, partial=self.partial)
                 ser.context["request"] = self.context['request'] if 'request' in self.context else None
@@ -235,16 +792,15 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
         return res
 
     def data_validator(self, attr, value):
-        model_serializer = self.Meta.DNM_config[attr]["serializer"]
+        model_serializer = self.get_field_config(attr)["serializer"]
         model = model_serializer.Meta.model
         res = None
         if model_serializer is not None:  # if the secondary filter is exists.
-            filters = self.Meta.DNM_config[attr]["filter"]
+            filters = self.get_field_config(attr)["filter"]
             if len(filters) >= 2 and filters[1] is not None and filters[1] in value:
-                filter_field = self.Meta.DNM_config[attr]["filter"][1]
-                model_filter = model.objects.filter(**{filter_field: value[filter_field]})
-                if model_filter.exists():
-                    model_filter = model_filter[0]
+                filter_field = self.get_field_config(attr)["filter"][1]
+                model_filter = self.get_nested_instance(attr, filter_field, value[filter_field], model)
+                if model_filter is not None:
                     value["id"] = model_filter.id
                     ser = model_serializer(model_filter, data=value, partial=self.partial)
                     ser.context["request"] = self.context['request'] if 'request' in self.context else None
@@ -262,46 +818,16 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
 
         return res
 
-    def reformat(self, attr, new_value, is_many=False, i=None):
-        if is_many:
-            if new_value is not None:
-                self.initial_data[attr][i] = new_value
-            else:
-                self.initial_data[attr].pop(i)
-        else:
-            if new_value is not None:
-                self.initial_data[attr] = new_value
-            else:
-                self.initial_data.pop(attr)
-
-    def initial_data_formatter(self, DNM_config):
-        # check if DNM_config was declared in Meta class if not create it.
-        if "DNM_config" not in self.Meta.__dict__:
-            self.Meta.DNM_config = {}
-        # check field DNM_config and set default value if it was not set.
-        for attr, value in [(attr, value) for attr, value in self.initial_data.items()]:
-            if attr not in self.Meta.DNM_config:
-                self.Meta.DNM_config[attr] = DNM_config["field"]
+    def initial_data_formatter(self):
+        for attr in [attr for attr in self.initial_data]:
             # set id read only to False.
             if attr == "id" and "extra_kwargs" in self.Meta.__dict__:
                 self.Meta.extra_kwargs["id"] = {"read_only": False}
             elif attr == "id":
                 self.Meta.extra_kwargs = {"id": {"read_only": False}}
-            # complete missing configurations.
-            for config in DNM_config['field'].keys():
-                if config not in self.Meta.DNM_config[attr]:
-                    self.Meta.DNM_config[attr][config] = DNM_config['field'][config]
-            # set serializers.
-            if attr in self.fields.fields and self.Meta.DNM_config[attr]["serializer"] is None:
-                field = self.fields.fields[attr]
-                # DNM_subclasses = [cls.__name__ for cls in DynamicNestedMixin.__subclasses__()]
-                f_ser = type(field) if isinstance(field, serializers.ModelSerializer) else type(field.child) \
-                    if isinstance(field, ListSerializer) and isinstance(field.child, serializers.ModelSerializer) \
-                    else None
-                self.Meta.DNM_config[attr]['serializer'] = f_ser
-
-                if f_ser is None and isinstance(field, BaseSerializer):
-                    self.initial_data.pop(attr)
+            # remove nested serializers that are not model serializers.
+            if self.get_field_plan(attr).drop:
+                self.initial_data.pop(attr)
 
     def set_field_read_only(self, field, value):
         """
@@ -324,11 +850,15 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
         if self.dynamic_fields_mixin_kwargs["return_pk"]:
             return instance.pk
 
-        ins = self.instance_validation(instance)
-        if ins:
-            return self.get_representation(ins)
-        else:
-            return OrderedDict()
+        with self.span("representation"):
+            ins = self.instance_validation(instance, cached=True)
+            if ins:
+                dependencies = _representation_dependencies.get()
+                if dependencies is not None and ins.pk is not None:
+                    dependencies.add(self.get_representation_cache_key(ins))
+                return self.get_cached_representation(ins)
+            else:
+                return OrderedDict()
 
     def get_representation(self, instance):
         """
@@ -352,24 +882,223 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
             if check_for_none is None:
                 ret[field.field_name] = None
             else:
-                ret[field.field_name] = field.to_representation(attribute)
-                if isinstance(ret[field.field_name], list):
-                    for obj in [r for r in ret[field.field_name]]:
-                        if isinstance(obj, OrderedDict) and len(obj) == 0:
-                            ret[field.field_name].pop(ret[field.field_name].index(obj))
+                value = field.to_representation(attribute)
+                if isinstance(value, list):  # remove empty items (not validated instances).
+                    value = [obj for obj in value if not (isinstance(obj, OrderedDict) and len(obj) == 0)]
+                ret[field.field_name] = value
 
         return ret
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        config = cls.get_representation_cache_config()
+        if config is not None and config["cache"] is not None:
+            _representation_cache_aliases.add(config["cache"])
+
+    @classmethod
+    def get_representation_cache_config(cls):
+        """
+        return the Meta.representation_cache options merged with the defaults, or None if the
+        representations of this serializer are not cached, the result is cached on the class.
+        """
+        if "_representation_cache_config" in cls.__dict__:
+            return cls._representation_cache_config
+
+        option = getattr(getattr(cls, "Meta", None), "representation_cache", None)
+        config = None
+        if option and getattr(cls.Meta, "model", None) is not None:
+            config = {
+                "version_field": None,  # a field that changes on every write (e.g. updated_at).
+                "cache": None,          # a django cache alias, None caches in the request only.
+                "timeout": 60,          # seconds the representations are kept in the django cache.
+            }
+            if isinstance(option, Mapping):
+                unknown = set(option) - set(config)
+                if unknown:
+                    raise Exception(f'unknown representation_cache options for "{cls.__name__}": {sorted(unknown)}')
+                config.update(option)
+
+        cls._representation_cache_config = config
+        return config
+
+    @staticmethod
+    def get_representation_cache_key(instance):
+        """
+        return the django cache key of the cached representations of an instance, one key holds
+        the representations of all the serializers and field selections of the instance.
+        """
+        return f"DynamicNestedField.representation:{instance._meta.label_lower}:{instance.pk}"
+
+    def get_representation_selection(self):
+        """
+        return a (selection, shared) tuple for this serializer, selection is a digest of the
+        fields it represents (with the nested fields and the restql query) and shared is False when
+        the output can depend on the request or on nested instances that are not tracked (see
+        is_shared_representation), so it is not kept in the django cache tier.
+        """
+        if "_representation_selection" not in self.__dict__:
+            shared = self.is_shared_representation(self, root=True)
+            stack, parts = [(self, ())], []
+            while stack:
+                serializer, path = stack.pop()
+                parts.append((path, list(serializer.fields), repr(getattr(serializer, "restql_nested_parsed_queries", None))))
+                for name, field in serializer.fields.items():
+                    if isinstance(field, ListSerializer):
+                        shared = shared and type(field).to_representation in _shared_list_representations
+                        field = field.child
+                    if isinstance(field, BaseSerializer) and hasattr(field, "fields"):
+                        shared = shared and self.is_shared_representation(field)
+                        stack.append((field, path + (name,)))
+                    else:
+                        shared = shared and self.is_shared_representation_field(field)
+            selection = hashlib.md5(repr(parts).encode()).hexdigest()
+            self._representation_selection = (selection, shared)
+        return self._representation_selection
+
+    @staticmethod
+    def is_shared_representation(serializer, root=False):
+        """
+        return False if the output of a serializer can depend on the request (it overrides
+        to_representation or get_representation, or it is nested and validates its instances),
+        or if it is a nested serializer that is not a DynamicNestedMixin, as the instances it
+        represents are not tracked to invalidate the cached representation.
+        """
+        if not isinstance(serializer, DynamicNestedMixin):
+            return False
+        if type(serializer).to_representation is not DynamicNestedMixin.to_representation:
+            return False
+        if type(serializer).get_representation is not DynamicNestedMixin.get_representation:
+            return False
+        return root or not getattr(serializer.Meta, "instance_validator", None)
+
+    @staticmethod
+    def is_shared_representation_field(field):
+        """
+        return False if the output of a field can depend on the request (method fields, hidden
+        fields, urls built with the request host and field classes that are not rest_framework
+        fields, as they can read the serializer context) or on related instances that are not tracked.
+        """
+        if isinstance(field, serializers.ManyRelatedField):
+            field = field.child_relation
+        if isinstance(field, _unshared_representation_fields):
+            return False
+        return type(field).__module__.startswith("rest_framework.")
+
+    def get_cached_representation(self, instance):
+        """
+        return the representation of an instance from the representation cache (see
+        Meta.representation_cache), the request tier keeps it for the rest of the request and the
+        optional django cache tier keeps it for the timeout, a cache miss calls get_representation.
+        """
+        config = self.get_representation_cache_config()
+        request = self.get_request()
+        if config is None or request is None or instance.pk is None:
+            return self.get_representation(instance)
+
+        selection, shared = self.get_representation_selection()
+        version = getattr(instance, config["version_field"]) if config["version_field"] else None
+        key = (f"{type(self).__module__}.{type(self).__qualname__}", selection, version)
+
+        cache_key = self.get_representation_cache_key(instance)
+        entries = get_request_cache(request, "representations").setdefault(cache_key, {})
+        if key not in entries:
+            cache = caches[config["cache"]] if config["cache"] is not None and shared else None
+            stored = cache.get(cache_key, {}) if cache is not None else {}
+            if key not in stored:
+                stored[key] = self.build_cached_representation(instance, cache_key)
+                if cache is not None:
+                    cache.set(cache_key, stored, config["timeout"])
+                    self.add_representation_dependents(cache, cache_key, stored[key][1], config["timeout"])
+            entries[key] = stored[key]
+            self.add_representation_dependents(
+                get_request_cache(request, "representation_dependents"), cache_key, entries[key][1]
+            )
+
+        representation, dependencies = entries[key]
+        parent_dependencies = _representation_dependencies.get()
+        if parent_dependencies is not None:  # the parent representation depends on them too.
+            parent_dependencies.update(dependencies)
+        return copy_representation(representation)
+
+    def build_cached_representation(self, instance, cache_key):
+        """
+        return a (representation, dependencies) tuple, dependencies are the cache keys of the
+        nested instances in the representation (at any depth), writing one of them invalidates it.
+        """
+        token = _representation_dependencies.set(set())
+        try:
+            representation = self.get_representation(instance)
+            dependencies = _representation_dependencies.get()
+        finally:
+            _representation_dependencies.reset(token)
+        dependencies.discard(cache_key)
+        return representation, frozenset(dependencies)
+
+    @staticmethod
+    def get_dependents_cache_key(cache_key):
+        return f"{cache_key}:dependents"
+
+    def add_representation_dependents(self, cache, cache_key, dependencies, timeout=None):
+        """
+        add cache_key to the dependents of its dependencies, in the request tier (a dict) or in a
+        django cache, so invalidate_representations can find the representations that include them.
+        """
+        if not dependencies:
+            return
+        if isinstance(cache, dict):
+            for dependency in dependencies:
+                cache.setdefault(dependency, set()).add(cache_key)
+            return
+
+        keys = [self.get_dependents_cache_key(dependency) for dependency in dependencies]
+        dependents = cache.get_many(keys)
+        for key in keys:
+            dependents[key] = dependents.get(key, set()) | {cache_key}
+        cache.set_many(dependents, timeout)
+
+    def invalidate_representations(self, instance):
+        """
+        remove the cached representations of a written instance and of the representations that
+        include it (e.g. the B rows with this C) from the request tier and from the django caches.
+        """
+        cache_key = self.get_representation_cache_key(instance)
+        dependents_key = self.get_dependents_cache_key(cache_key)
+        request = self.get_request()
+        if request is not None:
+            entries = get_request_cache(request, "representations")
+            for key in {cache_key} | get_request_cache(request, "representation_dependents").pop(cache_key, set()):
+                entries.pop(key, None)
+        for alias in _representation_cache_aliases:
+            cache = caches[alias]
+            cache.delete_many([cache_key, dependents_key, *cache.get(dependents_key, ())])
+
+    def get_fields(self):  # override
+        """
+        build the fields of each serializer class once per request and give every serializer a
+        copy of them, so the nested serializers created for every item don't build the model
+        fields again.
+        """
+        request = self.get_request()
+        if request is None:
+            return super().get_fields()
+
+        templates = get_request_cache(request, "fields")
+        if type(self) not in templates:
+            templates[type(self)] = super().get_fields()
+        return copy.deepcopy(templates[type(self)])
+
     @property
     def _writable_fields(self):  # override
-        for field in self.fields.values():
+        fields = self.fields
+        if not getattr(self, "_id_writable", False):
+            # removing read_only property from id fields (once per serializer).
+            if "id" in fields and fields["id"].read_only:
+                fields["id"].read_only = False
+                fields["id"].required = False
+            self._id_writable = True
+        for field in fields.values():
             if not field.read_only:
                 yield field
-            elif field.field_name == "id":
-                # removing read_only property from id fields.
-                field.read_only = False
-                field.required = False
-                yield field
 
     def to_internal_value(self, data):  # override
         """
@@ -389,7 +1118,6 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
 
         for field in fields:
             validate_method = getattr(self, 'validate_' + field.field_name, None)
-            self.set_field_read_only(field, False)  # setting fields to read_only = False
             primitive_value = field.get_value(data)
             try:
                 validated_value = field.run_validation(primitive_value)
@@ -427,7 +1155,7 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
         context = getattr(self, "context", None)
         requests = context['request'] if context and 'request' in context.keys() else None
         if requests is None:
-            requests = _requests[threading.get_ident()] if threading.get_ident() in _requests else None
+            requests = get_current_request()
         return requests
 
     # def get_field_names(self, declared_fields, info):  # override
@@ -454,46 +1182,46 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
     #     return super().get_field_names(declared_fields, info)
 
     def removeNoneValues(self, data):
-        if isinstance(data, dict):
-            for attr, value in {d: data[d] for d in data}.items():
-                if isinstance(value, dict):
-                    self.removeNoneValues(value)
-                elif isinstance(value, list):
-                    self.removeNoneValues(value)
-                elif value is None:
-                    data.pop(attr)
-        elif isinstance(data, list):
-            for value in [d for d in data]:
-                if isinstance(value, dict):
-                    self.removeNoneValues(value)
-                elif isinstance(value, list):
-                    self.removeNoneValues(value)
-                elif value is None:
-                    data.remove(value)
+        return remove_none_values(data)
 
     def run_validation(self, data=empty):
-        # override method. remove all UniqueValidator before running validation.
-        self.remove_validator(self, UniqueValidator)
+        # override method. prepare the fields before running validation.
+        self.prepare_writable_fields()
         return super().run_validation(data)
 
+    def prepare_writable_fields(self):
+        """
+        prepare the fields tree for writing once per serializer (not for every validated item),
+        all UniqueValidator are removed and the fields of nested serializers are set to read_only = False.
+        """
+        if getattr(self, "_writable_fields_prepared", False):
+            return
+        self._writable_fields_prepared = True
+        self.remove_validator(self, UniqueValidator)
+        for field in self._writable_fields:
+            self.set_field_read_only(field, False)  # setting fields to read_only = False
+
     def remove_validator(self, field, validator_to_remove):
         # this function support removing nested validators.
         if hasattr(field, "validators"):
-            for validator in field.validators:
-                if isinstance(validator, validator_to_remove):
-                    field.validators.remove(validator)
+            validators = field.validators
+            validators[:] = [validator for validator in validators if not isinstance(validator, validator_to_remove)]
         if hasattr(field, "_writable_fields"):
             for subfield in field._writable_fields:
                 self.remove_validator(subfield, validator_to_remove)
 
     def update_and_set_m2m(self, instance, m2m_fields, info):
-        for attr, value in m2m_fields:
+        for attr, value in self.traced("m2m", m2m_fields):
             field = getattr(instance, attr)  # the field or the attribute that we will update with new data.
-            config = self.Meta.DNM_config[attr] if "DNM_config" in self.Meta.__dict__ else {}
+            config = self.get_field_config(attr)
 
             if not config['can_be_edited']:
                 raise Exception(f'can not update attribute: "{attr}" when can_be_edited is set to False')
 
+            if config.get("bulk_write", False):
+                self.bulk_set_m2m(instance, attr, value, config, update=True)
+                continue
+
             # clear old data.
             if ("clear_data" in config.keys()) and config["clear_data"]:
                 for i in [material.id for material in field.all()]:
@@ -501,19 +1229,20 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
 
             # set new data.
             filter_field = config['filter'][0]
+            old_instances = self.fetch_lookups(  # get all old data with one query.
+                attr, field.model, filter_field, [data[filter_field] for data in value if filter_field in data],
+                config, for_update=config.get("select_for_update", False)
+            )
+            instances = []  # instances are added to the field together.
             for data in value:
-                if filter_field in data:  # if filter was in the data then we will search for old data.
-                    filtered_data = field.model.objects.filter(**{filter_field: data[filter_field]})
-                    if filtered_data.exists():
-                        ser = config["serializer"](filtered_data[0], data=data, partial=self.partial)
-                        ser.context["request"] = self.context['request'] if 'request' in self.context else None
-                        if ser.is_valid():
-                            ser.update(ser.instance, data)
-                            field.add(ser.instance)
-                    else:
-                        raise Exception(
-                            f"no filtered_field equal to ({filter_field}={data[filter_field]}) for attribute: {attr}"
-                        )
+                if filter_field in data:  # if filter was in the data then we will use old data.
+                    old_instance = old_instances[self.get_lookup_key(field.model, filter_field, data[filter_field])]
+                    ser = config["serializer"](old_instance, data=data, partial=self.partial)
+                    ser.context["request"] = self.context['request'] if 'request' in self.context else None
+                    if ser.is_valid():
+                        ser.update(ser.instance, data)
+                        self.add_child_changes(attr, ser, many=True)
+                        instances.append(ser.instance)
                 else:
                     if not config['create_new_instance']:
                         raise Exception(
@@ -523,14 +1252,20 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
                         'request'] if 'request' in self.context else None
                     if serialized_data.is_valid():
                         ins = serialized_data.save()
-                        field.add(ins)
+                        instances.append(ins)
                     else:
                         raise Exception(serialized_data.errors)
+            if instances:
+                field.add(*instances)
 
     def create_and_set_m2m(self, instance, m2m_fields, info):
-        for attr, value in m2m_fields:
+        for attr, value in self.traced("m2m", m2m_fields):
             field = getattr(instance, attr)  # the field or the attribute that we will update with new data.
-            config = self.Meta.DNM_config[attr] if "DNM_config" in self.Meta.__dict__ else {}
+            config = self.get_field_config(attr)
+
+            if config.get("bulk_write", False):
+                self.bulk_set_m2m(instance, attr, value, config, update=False)
+                continue
 
             # clear old data.
             if ("clear_data" in config.keys()) and config["clear_data"]:
@@ -539,6 +1274,11 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
 
             # set new data.
             filter_field = config['filter'][0]
+            old_instances = self.fetch_lookups(  # get all old data with one query.
+                attr, field.model, filter_field, [data[filter_field] for data in value if filter_field in data],
+                config
+            )
+            instances = []  # instances are added to the field together.
             for data in value:
                 if filter_field not in data:
                     if not config['create_new_instance']:
@@ -547,24 +1287,236 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
                     serialized_data.context["request"] = self.context['request'] if 'request' in self.context else None
                     if serialized_data.is_valid():
                         ins = serialized_data.save()
-                        field.add(ins)
+                        instances.append(ins)
                     else:
                         raise Exception(serialized_data.errors)
                 else:  # if filtered_field is in data then set the data without updating.
-                    filtered_data = field.model.objects.filter(**{filter_field: data[filter_field]})
-                    if filtered_data.exists():
-                        ser = config["serializer"](filtered_data[0], data=data, partial=self.partial)
-                        ser.context["request"] = self.context['request'] if 'request' in self.context else None
-                        if ser.is_valid():
-                            field.add(ser.instance)
-                    else:
-                        raise Exception(
-                            f"no filtered_field equal to ({filter_field}={data[filter_field]}) for attribute: {attr}"
-                        )
+                    old_instance = old_instances[self.get_lookup_key(field.model, filter_field, data[filter_field])]
+                    ser = config["serializer"](old_instance, data=data, partial=self.partial)
+                    ser.context["request"] = self.context['request'] if 'request' in self.context else None
+                    if ser.is_valid():
+                        instances.append(ser.instance)
+            if instances:
+                field.add(*instances)
+
+    def bulk_set_m2m(self, instance, attr, value, config, update=False):
+        """
+        bulk version of update_and_set_m2m and create_and_set_m2m, used when "bulk_write" is set
+        to True in the field DNM_config. old data is cleared with a single query and all the
+        instances are added to the field with one add() call.
+        """
+        field = getattr(instance, attr)  # the field or the attribute that we will update with new data.
+
+        # clear old data.
+        if config.get("clear_data", False):
+            field.clear()
+
+        instances = self.get_m2m_instances(attr, value, field.model, config, update=update)
+        if instances:
+            field.add(*instances)
+
+    def get_m2m_instances(self, attr, value, model, config, update=False):
+        """
+        return the model instances for a list of m2m data in the same order, old data is fetched
+        with one query and new data is created, when "bulk_write" is set in the field config
+        new instances without nested relations are created with bulk_create.
+        """
+        request = self.context['request'] if 'request' in self.context else None
+        filter_field = config['filter'][0]
+        instances = [None] * len(value)
+        old_data = [(i, data) for i, data in enumerate(value) if filter_field in data]
+        new_data = [(i, data) for i, data in enumerate(value) if filter_field not in data]
+
+        if new_data and not config['create_new_instance']:
+            raise Exception(f'can not create attribute: "{attr}" when create_new_instance is set to False')
+
+        # get all old data with one query.
+        if old_data:
+            found = self.fetch_lookups(
+                attr, model, filter_field, [data[filter_field] for _, data in old_data],
+                config, for_update=update and config.get("select_for_update", False)
+            )
+            for i, data in old_data:
+                ins = found[self.get_lookup_key(model, filter_field, data[filter_field])]
+                # only update old data when the body contains more than the filter value.
+                if update and any(key != filter_field for key in data):
+                    ser = config["serializer"](ins, data=data, partial=self.partial)
+                    ser.context["request"] = request
+                    if ser.is_valid():
+                        ser.update(ser.instance, data)
+                        self.add_child_changes(attr, ser, many=True)
+                instances[i] = ins
+
+        # create new data that has no nested relations with bulk_create.
+        if config.get("bulk_write", False) and self.can_bulk_create(model):
+            info = GenericFilterSet.get_model_info(model)
+            bulk_data = [(i, data) for i, data in new_data if all(key in info.fields for key in data)]
+            if bulk_data:
+                child = config["serializer"](context=self.context)
+                child.check_permissions()
+                created = model.objects.bulk_create([model(**data) for _, data in bulk_data])
+                validated = [child.instance_validation(ins) for ins in created]
+                if any(ins is None for ins in validated):
+                    model.objects.filter(pk__in=[ins.pk for ins in created]).delete()
+                    raise Exception(f'model instance validation failed for model: {model}')
+                for (i, _), ins in zip(bulk_data, validated):
+                    instances[i] = ins
+
+        # create the rest of new data with its own serializer.
+        for i, data in new_data:
+            if instances[i] is not None:
+                continue
+            serialized_data = config["serializer"](data=data, partial=self.partial)
+            serialized_data.context["request"] = request
+            if serialized_data.is_valid():
+                instances[i] = serialized_data.save()
+            else:
+                raise Exception(serialized_data.errors)
+
+        return instances
+
+    def bulk_create_and_set_m2m(self, instances, m2m_fields_list, info):
+        """
+        create_and_set_m2m for many new instances at once, the data of every m2m attribute is
+        collected from all instances and the relations are inserted with one bulk_create on the
+        through model, m2m fields with custom through models use create_and_set_m2m.
+        """
+        values_by_attr = OrderedDict()
+        for instance, m2m_fields in zip(instances, m2m_fields_list):
+            for attr, value in m2m_fields:
+                values_by_attr.setdefault(attr, []).append((instance, value))
+
+        for attr, values in self.traced("m2m", values_by_attr.items()):
+            config = self.get_field_config(attr)
+            model_field = info.relations[attr].model_field
+            if not isinstance(model_field, models.ManyToManyField) or \
+                    not model_field.remote_field.through._meta.auto_created:
+                for instance, value in values:
+                    self.create_and_set_m2m(instance, [(attr, value)], info)
+                continue
+
+            related = iter(self.get_m2m_instances(
+                attr, [data for _, value in values for data in value], info.relations[attr].related_model, config
+            ))
+            through = model_field.remote_field.through
+            rows, seen = [], set()
+            for instance, value in values:
+                for _ in value:
+                    ins = next(related)
+                    if (instance.pk, ins.pk) not in seen:
+                        seen.add((instance.pk, ins.pk))
+                        rows.append(through(**{
+                            model_field.m2m_field_name(): instance,
+                            model_field.m2m_reverse_field_name(): ins,
+                        }))
+            through.objects.bulk_create(rows)
+
+    @staticmethod
+    def can_bulk_create(model):
+        """
+        bulk_create can be used only when the database returns the primary keys of inserted
+        rows (needed to add them to m2m fields) and the model has no multi-table inheritance.
+        """
+        connection = connections[router.db_for_write(model)]
+        return connection.features.can_return_rows_from_bulk_insert and not model._meta.parents
+
+    def resolve_foreign_keys(self, fields, info, update=False):
+        """
+        get the old data of every foreign key field that has its filter value in the body,
+        using one query per related model, returns a list of instances (or None) in the same order of fields.
+        """
+        lookups_by_model = self.collect_foreign_key_lookups(fields, info)
+        results = []
+        with self.span("resolve_foreign_keys"):
+            for model, lookups in lookups_by_model.items():
+                for_update = self.is_locked_lookup(fields, lookups, update)
+                pending = self.get_pending_foreign_keys(model, lookups, for_update)
+                results.append(list(self.get_foreign_key_queryset(model, pending, for_update)) if pending else [])
+        return self.match_foreign_keys(fields, lookups_by_model, results, update)
+
+    def get_pending_foreign_keys(self, model, lookups, for_update=False):
+        """
+        return the foreign key lookups with values that are not in the identity map.
+        """
+        return [
+            lookup for lookup in lookups
+            if self.get_pending_values(model, lookup[1], [lookup[2]], for_update)
+        ]
+
+    def is_locked_lookup(self, fields, lookups, update=False):
+        # lock old data of updated fields with "select_for_update" in their config.
+        return update and any(self.get_field_config(fields[i][0]).get("select_for_update", False) for i, _, _ in lookups)
+
+    def collect_foreign_key_lookups(self, fields, info):
+        lookups_by_model = OrderedDict()  # {model: [(index in fields, filter_field, filter_value)]}
+        for i, (attr, value) in enumerate(fields):
+            config = self.get_field_config(attr)
+            filter_field = config['filter'][0]
+            if attr in info.relations and isinstance(value, Mapping) and filter_field in value:
+                model = info.relations[attr].related_model
+                lookups_by_model.setdefault(model, []).append((i, filter_field, value[filter_field]))
+        return lookups_by_model
+
+    @staticmethod
+    def get_foreign_key_queryset(model, lookups, for_update=False):
+        values_by_filter = OrderedDict()
+        for _, filter_field, filter_value in lookups:
+            values_by_filter.setdefault(filter_field, []).append(filter_value)
+        query = Q()
+        for filter_field, values in values_by_filter.items():
+            query |= Q(**{f"{filter_field}__in": values})
+        queryset = model.objects.filter(query)
+        if DynamicNestedMixin.is_locking(model, for_update):
+            queryset = queryset.select_for_update()
+        return queryset
+
+    def match_foreign_keys(self, fields, lookups_by_model, results, update=False):
+        resolved = [None] * len(fields)
+        identity_map = self.get_identity_map()
+        for (model, lookups), objs in zip(lookups_by_model.items(), results):
+            self.map_instances(
+                model, objs, list(OrderedDict.fromkeys(filter_field for _, filter_field, _ in lookups)),
+                self.is_locking(model, self.is_locked_lookup(fields, lookups, update))
+            )
+            for i, filter_field, filter_value in lookups:
+                resolved[i] = identity_map.get(self.get_identity_key(
+                    model, filter_field, self.get_lookup_key(model, filter_field, filter_value)
+                ))
+
+        # raise one exception for all the filter values that were not found.
+        missing = OrderedDict()
+        for lookups in lookups_by_model.values():
+            for i, filter_field, filter_value in lookups:
+                if resolved[i] is None:
+                    missing.setdefault((fields[i][0], filter_field), []).append(filter_value)
+        if missing:
+            raise Exception(OrderedDict(
+                (attr, self.get_lookup_error(attr, filter_field, values)) for (attr, filter_field), values in missing.items()
+            ))
+        return resolved
+
+    @staticmethod
+    def get_changed_fields(instance, data):
+        """
+        return the names of the model fields in data that have different values from the instance,
+        or None if data contains relations or other non-model fields.
+        """
+        info = GenericFilterSet.get_model_info(type(instance))
+        changed = []
+        for attr, value in data.items():
+            if attr in info.fields:
+                if getattr(instance, attr) != value:
+                    changed.append(attr)
+            elif attr not in info.fields_and_pk:
+                return None
+        return changed
 
     def update_and_set_foreign_key(self, instance, fields, info):
-        for attr, value in fields:
-            config = self.Meta.DNM_config[attr] if "DNM_config" in self.Meta.__dict__ else {}
+        resolved = self.resolve_foreign_keys(fields, info, update=True)
+        bulk_updates = OrderedDict()  # {model: ([instances], {changed fields})}
+        for i, (attr, value) in enumerate(self.traced("foreign_key", fields)):
+            old_instance = resolved[i]
+            config = self.get_field_config(attr)
 
             if not config['can_be_edited']:
                 raise Exception(f'can not update attribute: "{attr}" when can_be_edited is set to False')
@@ -572,18 +1524,35 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
             # set new data.
             filter_field = config['filter'][0]
             if filter_field in value:  # if filter was in the data then we will search for old data.
-                field_model = info.relations[attr].related_model if attr in info.relations else None
-                filtered_data = field_model.objects.filter(**{filter_field: value[filter_field]})
-                if filtered_data is not None and filtered_data.exists():
-                    ser = config["serializer"](filtered_data[0], data=value, partial=self.partial)
-                    ser.context["request"] = self.context['request'] if 'request' in self.context else None
-                    if ser.is_valid():
-                        ser.update(ser.instance, value)
-                        setattr(instance, attr, ser.instance)
-                else:
+                if old_instance is None:
                     raise Exception(
                         f"no filtered_field equal to ({filter_field}={value[filter_field]}) for attribute: {attr}"
                     )
+                changed = self.get_changed_fields(old_instance, value) if config.get("bulk_write", False) else None
+                if changed is not None:  # only normal fields, update it later with bulk_update.
+                    ser = config["serializer"](context=self.context)
+                    ser.check_permissions()
+                    old_instance = ser.instance_validation(old_instance)
+                    if old_instance is None:
+                        raise Exception(f'model instance validation failed for attribute: {attr}')
+                    if changed:
+                        for field_name in changed:
+                            setattr(old_instance, field_name, value[field_name])
+                        self.add_changes(attr, OrderedDict(
+                            [("id", old_instance.pk)] + [(field_name, value[field_name]) for field_name in changed]
+                        ))
+                        instances, update_fields = bulk_updates.setdefault(type(old_instance), ([], set()))
+                        instances.append(old_instance)
+                        update_fields.update(changed)
+                        ser.invalidate_representations(old_instance)
+                    setattr(instance, attr, old_instance)
+                    continue
+                ser = config["serializer"](old_instance, data=value, partial=self.partial)
+                ser.context["request"] = self.context['request'] if 'request' in self.context else None
+                if ser.is_valid():
+                    ser.update(ser.instance, value)
+                    self.add_child_changes(attr, ser)
+                    setattr(instance, attr, ser.instance)
             else:
                 # raise Exception(f'no filtered_field ({value[filter_field]}) for attribute: {attr}')
                 if not config['create_new_instance']:
@@ -595,9 +1564,21 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
                 else:
                     raise Exception(serialized_data.errors)
 
-    def create_and_set_foreign_key(self, instance, fields, info):
-        for attr, value in fields:
-            config = self.Meta.DNM_config[attr] if "DNM_config" in self.Meta.__dict__ else {}
+        # write all changed foreign key instances with one query per model, bulk_update() does not
+        # call pre_save() so the auto_now fields are set here.
+        for model, (instances, update_fields) in bulk_updates.items():
+            auto_now = [field for field in model._meta.concrete_fields if getattr(field, "auto_now", False)]
+            for old_instance in instances:
+                for field in auto_now:
+                    field.pre_save(old_instance, False)
+            model.objects.bulk_update(instances, self.get_update_fields(instances[0], sorted(update_fields)))
+
+    def create_and_set_foreign_key(self, instance, fields, info, resolved=None):
+        if resolved is None:
+            resolved = self.resolve_foreign_keys(fields, info)
+        for i, (attr, value) in enumerate(self.traced("foreign_key", fields)):
+            old_instance = resolved[i]
+            config = self.get_field_config(attr)
 
             # set new data.
             filter_field = config['filter'][0]
@@ -611,10 +1592,8 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
                 else:
                     raise Exception(serialized_data.errors)
             else:  # if filtered_field is in data then set the data without updating.
-                field_model = info.relations[attr].related_model if attr in info.relations else None
-                filtered_data = field_model.objects.filter(**{filter_field: value[filter_field]})
-                if filtered_data is not None and filtered_data.exists():
-                    ser = config["serializer"](filtered_data[0], data=value, partial=self.partial)
+                if old_instance is not None:
+                    ser = config["serializer"](old_instance, data=value, partial=self.partial)
                     ser.context["request"] = self.context['request'] if 'request' in self.context else None
                     if ser.is_valid():
                         setattr(instance, attr, ser.instance)
@@ -631,55 +1610,65 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         self.check_permissions()  # permission check.
+        info = self.get_nested_plan().info  # information about model data.
+        with self.span("update"), self.write_atomic():
+            return self.update_instance(instance, validated_data, info)
+
+    def update_instance(self, instance, validated_data, info):
+        """
+        update() without the permission check, used by the list serializer to update many
+        instances after checking the permissions once.
+        """
         ins = self.instance_validation(instance)  # instance validation.
 
         if ins is None:
             raise Exception(f'model instance validation failed for model: {type(instance)}')
 
         instance = ins
-        info = model_meta.get_field_info(instance)  # information about model data.
+        # only the fields changed by this update are saved, and an unchanged instance is not saved.
+        state = self.get_instance_state(instance)
+        self.changes = OrderedDict()
 
         m2m_fields = []
         foreign_key_fields = []
         custom_fields = []
         for attr, value in validated_data.items():  # loop data to set attribute new data and separate other field.
-            if attr in info.relations and info.relations[attr].to_many:  # m2m fields.
+            kind = self.get_field_plan(attr).kind
+            if kind == "m2m":  # m2m fields.
                 m2m_fields.append((attr, value))
-            elif attr in info.relations and info.relations[attr].to_field is not None:  # foreign key fields.
+            elif kind == "foreign_key":  # foreign key fields.
                 foreign_key_fields.append((attr, value))
-            elif attr in info.fields:  # normal fields.
+            elif kind == "normal":  # normal fields.
                 setattr(instance, attr, value)
             else:  # custom fields.
                 custom_fields.append((attr, value))
 
-        self.update_and_set_m2m(instance, m2m_fields, info)
-        self.update_and_set_foreign_key(instance, foreign_key_fields, info)
-        self.update_and_set_custom_fields(instance, custom_fields, info)
+        if m2m_fields or foreign_key_fields or custom_fields:
+            with self.write_atomic(level=True):
+                self.update_and_set_m2m(instance, m2m_fields, info)
+                self.update_and_set_foreign_key(instance, foreign_key_fields, info)
+                self.update_and_set_custom_fields(instance, custom_fields, info)
 
-        instance.save()
+        changed = self.get_state_changes(instance, state)
+        self.save_changed_fields(instance, changed)
+        self.changes = self.get_changes_summary(instance, changed, self.changes)
+        self.invalidate_representations(instance)
 
         return instance
 
     def create(self, validated_data):
+        with self.span("create"):
+            return self.create_nested(validated_data)
+
+    def create_nested(self, validated_data):
         self.check_permissions()
-        info = model_meta.get_field_info(self.Meta.model)  # information about model data.
+        info = self.get_nested_plan().info  # information about model data.
 
-        m2m_fields = []
-        foreign_key_fields = []
-        custom_fields = []
-        # loop data to separate m2m, foreign key and custom fields.
-        for attr, value in [i for i in validated_data.items()]:
-            if attr in info.relations and info.relations[attr].to_many:  # m2m fields.
-                m2m_fields.append((attr, value))
-                validated_data.pop(attr)
-            elif attr in info.relations:  # foreign key fields.
-                foreign_key_fields.append((attr, value))
-                validated_data.pop(attr)
-            elif attr in info.fields:  # normal fields.
-                continue
-            else:  # custom fields.
-                custom_fields.append((attr, value))
-                validated_data.pop(attr)
+        if self.is_atomic_write():
+            with self.write_atomic():
+                return self.create_instance(validated_data, info)
+
+        m2m_fields, foreign_key_fields, custom_fields = self.split_create_data(validated_data)
 
         instance = self.Meta.model.objects.create(**validated_data)  # create the main instance.
 
@@ -695,41 +1684,592 @@ class DynamicNestedMixin(DynamicFieldsMixin, serializers.ModelSerializer):
             self.create_and_set_foreign_key(instance, foreign_key_fields, info)
             self.create_and_set_custom_fields(instance, custom_fields, info)
             instance.save()
+            self.invalidate_representations(instance)
+
+        return instance
+
+    def create_instance(self, validated_data, info):
+        """
+        create() with atomic_writes, forward foreign keys are resolved (or created) before
+        inserting the instance so it is written with one INSERT, and it is saved again only
+        with the fields that the m2m, relation or custom fields changed.
+        """
+        m2m_fields, foreign_key_fields, custom_fields = self.split_create_data(validated_data)
+        forward_fields = [field for field in foreign_key_fields if field[0] in info.forward_relations]
+        relation_fields = [field for field in foreign_key_fields if field[0] not in info.forward_relations]
+
+        instance = self.Meta.model(**validated_data)
+        if forward_fields:
+            with self.write_atomic(level=True):
+                self.create_and_set_foreign_key(instance, forward_fields, info)
+        instance.save(force_insert=True)  # create the main instance.
+
+        ins = self.instance_validation(instance)  # instance validation.
+        if ins is None:  # the atomic block rolls back the instance and its foreign keys.
+            raise Exception(f'model instance validation failed for model: {type(instance)}')
+        instance = ins
+
+        state = self.get_instance_state(instance)
+        if m2m_fields or relation_fields or custom_fields:
+            with self.write_atomic(level=True):
+                self.create_and_set_m2m(instance, m2m_fields, info)
+                self.create_and_set_foreign_key(instance, relation_fields, info)
+                self.create_and_set_custom_fields(instance, custom_fields, info)
+        self.save_changed_fields(instance, self.get_state_changes(instance, state))
+        self.invalidate_representations(instance)
 
         return instance
 
+    def span(self, phase, attr=None, many=False):
+        """
+        return the instrumentation span of a phase of this serializer (and of a nested attribute),
+        or a no-op context manager when no sink is set (see set_instrumentation_sink).
+        """
+        sink = _instrumentation_sink
+        if sink is None:
+            return _no_span
+        model = self.Meta.model
+        attributes = {"serializer": type(self).__name__, "model": model._meta.label, "phase": phase}
+        if attr is not None:
+            attributes["attribute"] = attr
+        if many:
+            attributes["many"] = True
+        return sink.span(f"DynamicNestedField.{phase}", attributes, using=router.db_for_write(model))
+
+    def traced(self, phase, fields):
+        """
+        return the (attr, value) fields, when a sink is set the code that handles each field in
+        a loop runs inside a span of the phase for that attribute.
+        """
+        if _instrumentation_sink is None:
+            return fields
+        return self._traced(phase, fields)
+
+    def _traced(self, phase, fields):
+        for attr, value in fields:
+            with self.span(phase, attr):
+                yield attr, value
+
+    def is_atomic_write(self):
+        # nested serializers inside an atomic write use it too.
+        return getattr(self.Meta, "atomic_writes", False) or _write_level.get() is not None
+
+    @contextlib.contextmanager
+    def write_atomic(self, level=False):
+        """
+        transaction.atomic() on the model database when Meta.atomic_writes is set, the nested
+        fields of an instance are written inside one savepoint (level=True) and the nested
+        serializers of these fields join it instead of opening a savepoint per item.
+        """
+        if not self.is_atomic_write():
+            yield
+            return
+        savepoint = level or not _write_level.get()
+        token = _write_level.set(level)
+        try:
+            with transaction.atomic(using=router.db_for_write(self.Meta.model), savepoint=savepoint):
+                yield
+        finally:
+            _write_level.reset(token)
+
+    @staticmethod
+    def get_instance_state(instance):
+        """
+        values of the concrete fields of the instance, used to find the fields to save.
+        """
+        return {
+            field.attname: instance.__dict__.get(field.attname, DEFERRED)
+            for field in instance._meta.concrete_fields if not field.primary_key
+        }
+
+    @staticmethod
+    def get_state_changes(instance, state):
+        """
+        return the attnames of the fields that changed since the state was taken.
+        """
+        return [attname for attname, value in state.items() if instance.__dict__.get(attname, DEFERRED) != value]
+
+    @staticmethod
+    def get_update_fields(instance, changed):
+        """
+        the changed fields with the auto_now fields of the instance.
+        """
+        return changed + [
+            field.attname for field in instance._meta.concrete_fields
+            if getattr(field, "auto_now", False) and field.attname not in changed
+        ]
+
+    def save_changed_fields(self, instance, changed):
+        """
+        save only the changed fields, nothing is written if no field changed.
+        """
+        if changed:
+            instance.save(update_fields=self.get_update_fields(instance, changed))
+
+    @staticmethod
+    def get_changes_summary(instance, changed, nested):
+        """
+        summary of an update, {field: new value} for the changed fields followed by the changes of
+        the nested instances ({"id": pk, ...changes}, or a list of them for m2m fields).
+        """
+        changes = OrderedDict()
+        for field in instance._meta.concrete_fields:
+            if field.attname not in changed:
+                continue
+            if field.is_relation:  # a foreign key that points to another instance.
+                if field.name not in nested:
+                    changes[field.name] = OrderedDict(id=getattr(instance, field.attname))
+            else:
+                changes[field.name] = getattr(instance, field.attname)
+        changes.update(nested)
+        return changes
+
+    def add_changes(self, attr, change, many=False):
+        if many:
+            self.changes.setdefault(attr, []).append(change)
+        else:
+            self.changes[attr] = change
+
+    def add_child_changes(self, attr, child, many=False):
+        """
+        add the changes of a nested serializer that updated an instance to the changes of this one.
+        """
+        changes = getattr(child, "changes", None)
+        if changes:
+            self.add_changes(attr, OrderedDict(id=child.instance.pk, **changes), many=many)
+
+    def split_create_data(self, validated_data):
+        """
+        separate m2m, foreign key and custom fields from validated_data, leaving only the
+        normal fields that can be used to create the model instance.
+        """
+        m2m_fields = []
+        foreign_key_fields = []
+        custom_fields = []
+        # loop data to separate m2m, foreign key and custom fields.
+        for attr, value in [i for i in validated_data.items()]:
+            kind = self.get_field_plan(attr).kind
+            if kind == "m2m":  # m2m fields.
+                m2m_fields.append((attr, value))
+                validated_data.pop(attr)
+            elif kind in ("foreign_key", "relation"):  # foreign key fields.
+                foreign_key_fields.append((attr, value))
+                validated_data.pop(attr)
+            elif kind == "normal":  # normal fields.
+                continue
+            else:  # custom fields.
+                custom_fields.append((attr, value))
+                validated_data.pop(attr)
+
+        return m2m_fields, foreign_key_fields, custom_fields
+
     def check_permissions(self):
         """
         Check if the request should be permitted.
         Raises an appropriate exception if the request is not permitted.
         """
         request = self.context['request']
-        vs = NestedModelViewSet()
-        vs.serializer_class = self
-        vs.check_permissions(request)
+        decisions = get_request_cache(request, "permissions")
+        if type(self) in decisions:  # already permitted in this request.
+            return
+
+        view = self.get_permission_view()
+        for permission in self.get_permissions(request.method):
+            if not permission.has_permission(request, view):
+                view.permission_denied(
+                    request,
+                    message=getattr(permission, 'message', None),
+                    code=getattr(permission, 'code', None)
+                )
+
+        decisions[type(self)] = True
+
+    @classmethod
+    def get_permissions(cls, method):
+        """
+        return the permissions of a request method from Meta.permission_classes_by_method or
+        Meta.permission_classes, the permissions are instantiated once per class and method.
+        """
+        permissions = cls.__dict__.get("_permissions")
+        if permissions is None:
+            permissions = cls._permissions = {}
 
-    def instance_validation(self, instance):
+        if method not in permissions:
+            assert getattr(cls.Meta, "permission_classes", None) is not None, (
+                "'%s' should include a `permission_classes` attribute" % cls.__name__
+            )
+            permission_classes_by_method = getattr(cls.Meta, "permission_classes_by_method", {})
+            # use permission for specific request method(e.g. POST) else use the main permission_class.
+            permission_classes = permission_classes_by_method.get(method, cls.Meta.permission_classes)
+            permissions[method] = [permission() for permission in permission_classes]
+
+        return permissions[method]
+
+    def get_permission_view(self):
+        """
+        return the view passed to has_permission(), a plain GenericAPIView with this serializer.
+        """
+        view = generics.GenericAPIView()
+        view.serializer_class = self
+        view.request = self.context['request']
+        return view
+
+    def instance_validation(self, instance, cached=False):
+        """
+        run the Meta.instance_validator validators on the instance, with cached=True (used when
+        reading data) the result of each validator is kept for the rest of the request, so an
+        instance that shows up many times in the response is validated once.
+        """
         request = self.get_request()
 
         if request is None:
             raise Exception(
                 f'can not find request in serializer context for "{self.__class__.__name__}" serializer')
 
-        if hasattr(self.Meta, "instance_validator"):
-            for validator in self.Meta.instance_validator:
-                instance = validator().validate(instance, request)
+        with self.span("instance_validation"):
+            for validator in self.get_instance_validators(request):
+                if cached:
+                    instance = self.cached_instance_validation(validator, instance, request)
+                else:
+                    instance = validator.validate(instance, request)
 
         return instance
 
+    def get_instance_validators(self, request):
+        """
+        return the Meta.instance_validator objects, each validator class is constructed once per request.
+        """
+        validators = get_request_cache(request, "instance_validators")
+        res = []
+        for validator_class in getattr(self.Meta, "instance_validator", []):
+            if validator_class not in validators:
+                validators[validator_class] = validator_class()
+            res.append(validators[validator_class])
+        return res
+
+    @staticmethod
+    def get_validation_key(validator, instance):
+        pk = getattr(instance, "pk", None)
+        if pk is None:
+            return None
+        return type(validator), instance._meta.concrete_model, pk
+
+    def cached_instance_validation(self, validator, instance, request):
+        key = self.get_validation_key(validator, instance)
+        if key is None:  # unsaved instances (or None) are not cached.
+            return validator.validate(instance, request)
+
+        results = get_request_cache(request, "instance_validation")
+        if key not in results:
+            result = validator.validate(instance, request)
+            results[key] = (result, result is instance)
+
+        result, same_instance = results[key]
+        # validators that return the given instance return this instance, not the cached one.
+        return instance if same_instance else result
+
+    def batch_instance_validation(self, instances):
+        """
+        validate a list of instances with the validate_many hook of each validator, the results
+        are cached so to_representation does not validate the instances again.
+        """
+        request = self.get_request()
+        if request is None:
+            return
+
+        results = get_request_cache(request, "instance_validation")
+        for validator in self.get_instance_validators(request):
+            missing = OrderedDict()
+            for instance in instances:
+                key = self.get_validation_key(validator, instance)
+                if key is not None and key not in results:
+                    missing[key] = instance
+
+            if missing:
+                validated = validator.validate_many(list(missing.values()), request)
+                for (key, instance), result in zip(missing.items(), validated):
+                    results[key] = (result, result is instance)
+
+            # the next validator gets the instances returned by this one.
+            instances = [
+                ins for ins in (self.cached_instance_validation(validator, ins, request) for ins in instances)
+                if ins is not None
+            ]
+
+    @classmethod
+    def get_only_fields(cls):
+        """
+        return the names of the model fields used by this serializer (for queryset.only()), or
+        None if it uses all the model fields, the result is cached on the class.
+        """
+        if "_only_fields" in cls.__dict__:
+            return cls._only_fields
+
+        fields = getattr(cls.Meta, "fields", None)
+        only_fields = None
+        if isinstance(fields, (list, tuple)):
+            opts = cls.Meta.model._meta
+            only_fields = [opts.pk.name]
+            for name in fields:
+                declared = cls._declared_fields.get(name)
+                source = getattr(declared, "source", None) or name
+                if source == "*":
+                    continue
+                try:
+                    model_field = opts.get_field(source.split(".")[0])
+                except FieldDoesNotExist:
+                    continue
+                if model_field.concrete and not model_field.many_to_many and model_field.name not in only_fields:
+                    only_fields.append(model_field.name)
+            only_fields.extend(name for name in cls.get_validator_fields() or [] if name not in only_fields)
+
+        cls._only_fields = only_fields
+        return only_fields
+
+    @classmethod
+    def get_validator_fields(cls):
+        """
+        return the model fields read by the Meta.instance_validator validators (their `fields`
+        attribute), or None if a validator does not declare them and it can read any field.
+        """
+        fields = []
+        for validator_class in getattr(cls.Meta, "instance_validator", None) or []:
+            validator_fields = getattr(validator_class, "fields", None)
+            if validator_fields is None:
+                return None
+            fields.extend(validator_fields)
+        return fields
+
+    @classmethod
+    def get_selected_fields(cls, parsed_query=None):
+        """
+        return the names of the serializer fields selected by a parsed restql query (all the fields
+        if no query is given), or None if the serializer fields can not be known from its Meta.
+        """
+        fields = getattr(cls.Meta, "fields", None)
+        exclude = getattr(cls.Meta, "exclude", None) or []
+        if fields == serializers.ALL_FIELDS or (fields is None and exclude):
+            opts = cls.Meta.model._meta
+            fields = [field.name for field in opts.fields + opts.many_to_many if field.name not in exclude]
+            fields.extend(name for name in cls._declared_fields if name not in fields)
+        elif not isinstance(fields, (list, tuple)):
+            return None
+
+        if parsed_query is None:
+            return list(fields)
+        included = [q.field_name if isinstance(q, Query) else q for q in parsed_query.included_fields]
+        return [
+            name for name in fields
+            if ("*" in included or name in included) and name not in parsed_query.excluded_fields
+        ]
+
+    @classmethod
+    def get_query_projection(cls, parsed_query=None):
+        """
+        return the queryset.only() paths of the model fields selected by a parsed restql query (or
+        of all the serializer fields), with the fields of the selected foreign key and one to one
+        serializers, or None if a selected field is not a model field (e.g. a method field) or an
+        instance validator does not declare the fields it reads, and all the fields must be loaded.
+        """
+        names = cls.get_selected_fields(parsed_query)
+        validator_fields = cls.get_validator_fields()
+        if names is None or validator_fields is None:
+            return None
+
+        opts = cls.Meta.model._meta
+        info = cls.get_nested_plan().info
+        nested_queries = {} if parsed_query is None else \
+            {q.field_name: q for q in parsed_query.included_fields if isinstance(q, Query)}
+        only = [opts.pk.name]
+        only.extend(name for name in validator_fields if name not in only)  # read by the instance validators.
+        config = cls.get_representation_cache_config()
+        if config is not None and config["version_field"] is not None:  # read by the representation cache.
+            only.append(config["version_field"])
+        for name in names:
+            field = cls._declared_fields.get(name)
+            source = (getattr(field, "source", None) or name).split(".")[0]
+            if source == "*":
+                return None
+            relation = info.relations.get(source)
+            if relation is None:
+                try:
+                    model_field = opts.get_field(source)
+                except FieldDoesNotExist:
+                    return None
+                if model_field.concrete and model_field.name not in only:
+                    only.append(model_field.name)
+                continue
+            if relation.to_many:  # prefetched with its own projection (see get_query_plan).
+                continue
+
+            if not relation.reverse and source not in only:
+                only.append(source)
+            serializer = field.child if isinstance(field, ListSerializer) else field
+            if isinstance(serializer, DynamicNestedMixin):  # selected with select_related.
+                nested = type(serializer).get_query_projection(nested_queries.get(name))
+                if nested is not None:
+                    only.extend(f"{source}__{path}" for path in nested)
+        return only
+
+    @classmethod
+    def get_query_plan(cls, parsed_query=None):
+        """
+        walk the nested serializers declared on this serializer (limited to the fields selected
+        by a parsed restql query if given) and return a (select_related, prefetch_related) tuple,
+        foreign key and one to one paths are selected and to many paths are prefetched with a
+        queryset that has its own nested plan and loads only the selected fields.
+        """
+        select_related = []
+        prefetch_related = []
+        info = cls.get_nested_plan().info
+
+        for name, field in cls._declared_fields.items():
+            serializer = field.child if isinstance(field, ListSerializer) else field
+            if not isinstance(serializer, serializers.ModelSerializer):
+                continue
+            source = field.source or name
+            if source not in info.relations:
+                continue
+
+            nested_query = None
+            if parsed_query is not None:
+                nested_queries = {q.field_name: q for q in parsed_query.included_fields if isinstance(q, Query)}
+                if name in nested_queries:
+                    nested_query = nested_queries[name]
+                elif name in parsed_query.excluded_fields or \
+                        ("*" not in parsed_query.included_fields and name not in parsed_query.included_fields):
+                    continue
+
+            if isinstance(serializer, DynamicNestedMixin):
+                nested_select, nested_prefetch = type(serializer).get_query_plan(nested_query)
+            else:
+                nested_select, nested_prefetch = [], []
+
+            if info.relations[source].to_many:
+                queryset = info.relations[source].related_model._default_manager.all()
+                only = type(serializer).get_query_projection(nested_query) \
+                    if isinstance(serializer, DynamicNestedMixin) else None
+                if only is not None:
+                    # reverse foreign keys need the foreign key of the prefetched rows.
+                    remote_field = getattr(getattr(cls.Meta.model, source, None), "field", None)
+                    if info.relations[source].reverse and remote_field is not None and remote_field.many_to_one:
+                        only.append(remote_field.name)
+                    queryset = queryset.only(*only)
+                if nested_select:
+                    queryset = queryset.select_related(*nested_select)
+                if nested_prefetch:
+                    queryset = queryset.prefetch_related(*nested_prefetch)
+                prefetch_related.append(Prefetch(source, queryset=queryset))
+            else:
+                select_related.append(source)
+                select_related.extend(f"{source}__{path}" for path in nested_select)
+                prefetch_related.extend(
+                    Prefetch(f"{source}__{prefetch.prefetch_through}", queryset=prefetch.queryset)
+                    for prefetch in nested_prefetch
+                )
+
+        return select_related, prefetch_related
+
+
+# fields whose output can depend on the request or on related instances that are not tracked, they
+# are not kept in the django cache tier of the representation cache (see get_representation_selection).
+_unshared_representation_fields = (
+    serializers.SerializerMethodField, serializers.HiddenField, serializers.HyperlinkedRelatedField,
+    serializers.FileField, serializers.StringRelatedField, serializers.SlugRelatedField,
+)
+_shared_list_representations = (
+    DynamicNestedListSerializer.to_representation, serializers.ListSerializer.to_representation,
+)
+
+
+def remove_none_values(data):
+    """
+    remove None values from data and from all its nested dicts and lists in place, every dict
+    and list is visited once (without recursion or copying) and lists are compacted in place.
+    """
+    stack = [data] if isinstance(data, (dict, list)) else []
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            none_keys = []
+            for key, value in item.items():
+                if value is None:
+                    none_keys.append(key)
+                elif isinstance(value, (dict, list)):
+                    stack.append(value)
+            for key in none_keys:
+                del item[key]
+        else:
+            size = 0
+            for value in item:
+                if value is not None:
+                    if isinstance(value, (dict, list)):
+                        stack.append(value)
+                    item[size] = value
+                    size += 1
+            del item[size:]
+    return data
+
+
+def copy_representation(data):
+    """
+    return a copy of a representation with new dicts and lists (the values are not copied), so
+    callers can change a cached representation (e.g. with remove_none_values) without changing the cache.
+    """
+    if isinstance(data, dict):
+        return type(data)((key, copy_representation(value)) for key, value in data.items())
+    if isinstance(data, list):
+        return [copy_representation(value) for value in data]
+    return data
+
+
+def get_current_request():
+    """
+    return the request that is being handled by the current thread or async task, or None.
+    """
+    return _request.get()
+
+
+def get_request_cache(request, name):
+    """
+    return a dict stored on the request under name, it is used to share data between the
+    serializers of one request and it is removed with the request.
+    """
+    request = getattr(request, "_request", request)  # use the same dict for django and DRF requests.
+    caches = request.__dict__.setdefault("_DNM_cache", {})
+    return caches.setdefault(name, {})
+
 
 class GlobalRequestMiddleware(object):
+    """
+    Keep the current request in a context variable so serializers without a request in
+    their context can find it, the request is removed when the response is returned.
+
+    This middleware supports both sync (WSGI) and async (ASGI) requests.
+    """
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        _requests[threading.get_ident()] = request
-        return self.get_response(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
+
+    async def __acall__(self, request):
+        token = _request.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _request.reset(token)
 
     def process_exception(self, request, exception):
         raise exception
@@ -740,39 +2280,109 @@ class GenericFilterSet:
     This class used to create a generic filter set for all django
     models fields, the set contains the main filters for each field.
 
-    Nested models are supported in this class.
+    Nested models are supported in this class, relations are walked up to max_depth
+    levels (None for no limit), a relation to a model that is already in the current
+    path is skipped to avoid cycles, and relation paths (e.g. "owner__org") can be
+    limited with the relations (allow) and exclude_relations (deny) lists.
+
+    Use get_filter_set() to get a FilterSet class that is created once per model and options.
     """
-    def __init__(self, model, enable_filter_schema=False, model_rel_field_name=""):
+    _filter_sets = {}
+    _filter_sets_lock = threading.Lock()
+    _models_info = {}    # memoized model_meta.get_field_info() results.
+    _models_fields = {}  # memoized non relational fields filters for each model.
+
+    def __init__(self, model, enable_filter_schema=False, model_rel_field_name="", max_depth=None,
+                 relations=None, exclude_relations=None, relation_path="", visited=()):
         self.model = model
         self.model_rel_field_name = f"{model_rel_field_name}__" if model_rel_field_name else ""
         self.fields = None
-        self.info = model_meta.get_field_info(self.model)
+        self.info = self.get_model_info(self.model)
         self.enable_filter_schema = enable_filter_schema
+        self.max_depth = max_depth
+        self.relations = relations
+        self.exclude_relations = exclude_relations
+        self.relation_path = relation_path
+        self.visited = (*visited, model)
         # create new FilterSet.
         self.FilterSet = self.create_filter_set()
 
+    @classmethod
+    def get_filter_set(cls, model, enable_filter_schema=False, max_depth=None, relations=None, exclude_relations=None):
+        """
+        return the FilterSet class of model from the process wide registry, creating it on first use.
+        """
+        key = (
+            model,
+            enable_filter_schema,
+            max_depth,
+            tuple(relations) if relations is not None else None,
+            tuple(exclude_relations) if exclude_relations is not None else None,
+        )
+        filter_set = cls._filter_sets.get(key)
+        if filter_set is None:
+            with cls._filter_sets_lock:
+                filter_set = cls._filter_sets.get(key)
+                if filter_set is None:
+                    filter_set = cls(
+                        model,
+                        enable_filter_schema,
+                        max_depth=max_depth,
+                        relations=relations,
+                        exclude_relations=exclude_relations,
+                    ).FilterSet
+                    cls._filter_sets[key] = filter_set
+        return filter_set
+
+    @classmethod
+    def get_model_info(cls, model):
+        info = cls._models_info.get(model)
+        if info is None:
+            info = cls._models_info[model] = model_meta.get_field_info(model)
+        return info
+
     def get_field_filters(self, field):
         # get field filter from our filters dict.
         return filtered_fields.get(field.__class__.__name__, [])
 
     def get_normal_meta_fields(self):
         # get models non relational fields.
-        return {
-            f"{self.model_rel_field_name}{k}": self.get_field_filters(v)
-            for k, v in self.info.fields_and_pk.items() if k != "pk"
-        }
+        fields = self._models_fields.get(self.model)
+        if fields is None:
+            fields = self._models_fields[self.model] = {
+                k: self.get_field_filters(v) for k, v in self.info.fields_and_pk.items() if k != "pk"
+            }
+        return {f"{self.model_rel_field_name}{k}": v for k, v in fields.items()}
+
+    def is_relation_allowed(self, path):
+        # check relation path against the allow and deny lists.
+        if self.exclude_relations is not None:
+            parts = path.split("__")
+            if any("__".join(parts[:i]) in self.exclude_relations for i in range(1, len(parts) + 1)):
+                return False
+        if self.relations is not None:
+            return any(rel == path or rel.startswith(f"{path}__") for rel in self.relations)
+        return True
 
     def get_meta_relational_fields(self):
         # get models relational fields.
         res = {}
+        if self.max_depth is not None and len(self.visited) > self.max_depth:
+            return res
         for k, v in self.info.forward_relations.items():
-            res = {
-                **res,
-                **{
-                    f"{self.model_rel_field_name}{k}": v
-                    for k, v in GenericFilterSet(v.related_model, model_rel_field_name=k).FilterSet.items()
-                }
-            }
+            path = f"{self.relation_path}__{k}" if self.relation_path else k
+            if v.related_model in self.visited or not self.is_relation_allowed(path):
+                continue
+            nested_fields = GenericFilterSet(
+                v.related_model,
+                model_rel_field_name=k,
+                max_depth=self.max_depth,
+                relations=self.relations,
+                exclude_relations=self.exclude_relations,
+                relation_path=path,
+                visited=self.visited,
+            ).FilterSet
+            res.update({f"{self.model_rel_field_name}{name}": filters for name, filters in nested_fields.items()})
         return res
 
     def create_filter_set(self):
@@ -843,6 +2453,22 @@ class CustomDjangoFilterBackend(django_filters.rest_framework.DjangoFilterBacken
             return []
 
 
+class NDJSONRenderer(renderers.JSONRenderer):
+    """
+    Renderer for newline delimited JSON, lists are rendered as one JSON item per line.
+    """
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, list):
+            return b"".join(self.render_item(item, accepted_media_type, renderer_context) for item in data)
+        return self.render_item(data, accepted_media_type, renderer_context)
+
+    def render_item(self, item, accepted_media_type=None, renderer_context=None):
+        return super().render(item, accepted_media_type, renderer_context) + b"\n"
+
+
 class NestedModelViewSet(QueryArgumentsMixin, viewsets.ModelViewSet):
     """
     Custom ModelViewSet class that support django rest_framework filters
@@ -854,10 +2480,197 @@ class NestedModelViewSet(QueryArgumentsMixin, viewsets.ModelViewSet):
         super().__init__(*args, **kwargs)
         enable_filter_schema = getattr(self, "enable_filter_schema", False)  # showing filters in swagger or not.
         if self.queryset is not None:
-            self.filterset_class = GenericFilterSet(self.queryset.model, enable_filter_schema).FilterSet
+            self.filterset_class = GenericFilterSet.get_filter_set(
+                self.queryset.model,
+                enable_filter_schema,
+                max_depth=getattr(self, "filter_max_depth", None),  # relations levels used in filters.
+                relations=getattr(self, "filter_relations", None),  # allowed relation paths.
+                exclude_relations=getattr(self, "filter_exclude_relations", None),  # excluded relation paths.
+            )
         else:
             self.filterset_class = None
 
+    def get_queryset(self):
+        """
+        apply the query plan of the serializer (select_related and prefetch_related of its
+        nested serializers, and only() of the selected fields) on read requests, set
+        `auto_query_plan = False` to disable it or `auto_query_projection = False` to load
+        all the model fields.
+        """
+        queryset = super().get_queryset()
+        request = getattr(self, "request", None)
+        if not getattr(self, "auto_query_plan", True) or getattr(self, "_skip_query_plan", False) or \
+                request is None or request.method not in SAFE_METHODS:
+            return queryset
+        serializer_class = self.get_serializer_class()
+        if not (isinstance(serializer_class, type) and issubclass(serializer_class, DynamicNestedMixin)):
+            return queryset
+        parsed_query = self.get_parsed_restql_query(request)
+        select_related, prefetch_related = serializer_class.get_query_plan(parsed_query)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        # the lookups already prefetched by the viewset queryset (and the levels they go through) win.
+        prefetched = set()
+        for lookup in queryset._prefetch_related_lookups:
+            parts = getattr(lookup, "prefetch_to", lookup).split("__")
+            prefetched.update("__".join(parts[:i]) for i in range(1, len(parts) + 1))
+        prefetch_related = [prefetch for prefetch in prefetch_related if prefetch.prefetch_to not in prefetched]
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        if getattr(self, "auto_query_projection", True) and queryset.query.select_related is not True:
+            only = serializer_class.get_query_projection(parsed_query)
+            if only is not None:
+                queryset = queryset.only(*self.merge_query_projection(queryset, only))
+        return queryset
+
+    @staticmethod
+    def merge_query_projection(queryset, only):
+        """
+        add the select_related paths and the only() fields already set on the queryset to the
+        only() fields of the serializer (the defer() fields of the queryset stay deferred).
+        """
+        only = list(only)
+        paths = [(name, related) for name, related in queryset.query.select_related.items()] \
+            if queryset.query.select_related else []
+        while paths:
+            path, related = paths.pop(0)
+            if not any(name == path or name.startswith(f"{path}__") for name in only):
+                only.append(path)
+            paths.extend((f"{path}__{name}", nested) for name, nested in related.items())
+        existing, defer = queryset.query.deferred_loading
+        if not defer:
+            only.extend(name for name in existing if name not in only)
+        return only
+
+    def get_queryset_without_plan(self):
+        """
+        return get_queryset() (with the overrides of the subclasses, e.g. the rows of the user)
+        without the query plan and the projection.
+        """
+        self._skip_query_plan = True
+        try:
+            return self.get_queryset()
+        finally:
+            self._skip_query_plan = False
+
+    def get_conditional_aggregates(self):
+        """
+        return the aggregates of the conditional GET validator, the number of rows and the max of
+        every path in `conditional_fields` (e.g. ["updated_at", "b__updated_at"]), override it to
+        use other aggregates over the nested relations.
+        """
+        fields = getattr(self, "conditional_fields", None)
+        if not fields:
+            raise Exception(f'"{type(self).__name__}" needs conditional_fields (or get_conditional_aggregates) '
+                            f'when conditional_get is set')
+        aggregates = {"count": Count("pk")}
+        aggregates.update((f"max_{path}", Max(path)) for path in fields)
+        return aggregates
+
+    def get_conditional_validators(self, queryset):
+        """
+        return the (etag, last modified datetime or None) of a queryset, the etag changes with the
+        aggregates and with the url, media type and user of the request.
+        """
+        values = queryset.order_by().aggregate(**self.get_conditional_aggregates())
+        request = self.request
+        key = repr((
+            f"{type(self).__module__}.{type(self).__qualname__}", request.get_full_path(),
+            getattr(request, "accepted_media_type", None), getattr(getattr(request, "user", None), "pk", None),
+            sorted(values.items()),
+        ))
+        dates = [value for value in values.values() if isinstance(value, datetime.datetime)]
+        return f'"{hashlib.md5(key.encode()).hexdigest()}"', max(dates) if dates else None
+
+    def get_conditional_response(self, queryset):
+        """
+        with `conditional_get = True` compute the validators of the queryset before serializing it,
+        return a 304 (or 412) response when the request preconditions match, else None (the
+        validators are added to the response headers by finalize_response).
+        """
+        self.conditional_validators = None
+        if not getattr(self, "conditional_get", False):
+            return None
+
+        etag, last_modified = self.conditional_validators = self.get_conditional_validators(queryset)
+        response = get_conditional_response(
+            self.request, etag=etag, last_modified=last_modified and int(last_modified.timestamp())
+        )
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, "conditional_validators", None)
+        if validators is not None and (200 <= response.status_code < 300 or response.status_code == 304):
+            etag, last_modified = validators
+            response.setdefault("ETag", etag)
+            if last_modified is not None:
+                response.setdefault("Last-Modified", http_date(last_modified.timestamp()))
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        answer conditional requests before the instance and its nested fields are loaded when
+        `conditional_get = True` is set on the ViewSet (see get_conditional_response).
+        """
+        if getattr(self, "conditional_get", False):
+            # the object permissions are checked on the row itself, without the query plan.
+            queryset = self.filter_queryset(self.get_queryset_without_plan())
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            self.check_object_permissions(request, generics.get_object_or_404(queryset))
+            response = self.get_conditional_response(queryset)
+            if response is not None:
+                return response
+        return super().retrieve(request, *args, **kwargs)
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if getattr(self, "stream_list", False):
+            renderers.append(NDJSONRenderer())
+        return renderers
+
+    def list(self, request, *args, **kwargs):
+        """
+        stream the list as a JSON array (or NDJSON for `Accept: application/x-ndjson`) when
+        `stream_list = True` is set on the ViewSet and the list is not paginated, and answer
+        conditional requests before serializing it when `conditional_get = True` is set.
+        """
+        if getattr(self, "conditional_get", False):
+            response = self.get_conditional_response(self.filter_queryset(self.get_queryset_without_plan()))
+            if response is not None:
+                return response
+
+        if not self.is_streaming(request):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer(queryset, many=True)
+        if not isinstance(serializer, DynamicNestedListSerializer):
+            return Response(serializer.data)
+        return self.get_streaming_response(serializer)
+
+    def is_streaming(self, request):
+        # browsable API and paginated lists are not streamed.
+        return getattr(self, "stream_list", False) and self.paginator is None and \
+            isinstance(getattr(request, "accepted_renderer", None), renderers.JSONRenderer)
+
+    def get_streaming_response(self, serializer):
+        renderer = self.request.accepted_renderer
+        rows = serializer.iter_representation(serializer.instance, getattr(self, "stream_chunk_size", 2000))
+        if isinstance(renderer, NDJSONRenderer):
+            content = (renderer.render_item(row) for row in rows)
+        else:
+            content = self.stream_json_array(renderer, rows)
+        return StreamingHttpResponse(content, content_type=renderer.media_type)
+
+    @staticmethod
+    def stream_json_array(renderer, rows):
+        yield b"["
+        for i, row in enumerate(rows):
+            yield b"," + renderer.render(row) if i else renderer.render(row)
+        yield b"]"
+
     def get_permissions(self):
         """
         Instantiates and returns the list of permissions that this view requires.
@@ -893,6 +2706,11 @@ class BaseInstanceValidator:
     - before updating serializer model data with the update() method (as in PUT, Patch request).
     - before Create serializer model data with the create() method (as in POST request).
     """
+    # the model fields read by the validator (e.g. ["owner"]), they are added to the queryset.only()
+    # of the query projection, None (the default) means that it can read any field and the
+    # serializers that use it load all the model fields.
+    fields = None
+
     def validate(self, instance, request):
         """
         validate function used to write validating logic for a specific instance and returning an
@@ -904,3 +2722,124 @@ class BaseInstanceValidator:
         :return: a validated instance or None value for non-validated instances
         """
         pass
+
+    def validate_many(self, instances, request):
+        """
+        batch version of validate called once for the instances of a listed field (as in GET request),
+        override it to validate all the instances with one query.
+
+        :param instances: list of instances to be validated
+        :param request: the request used to perform an action on these instances
+        :return: a list of validated instances or None values, in the same order of the instances
+        """
+        return [self.validate(instance, request) for instance in instances]
+
+    async def avalidate(self, instance, request):
+        """
+        async version of validate used by AsyncDynamicNestedMixin serializers, it runs validate
+        in a thread by default, override it to write async validating logic.
+        """
+        return await sync_to_async(self.validate)(instance, request)
+
+
+def set_instrumentation_sink(sink):
+    """
+    set the sink that receives the spans of the DynamicNestedMixin phases (e.g. in AppConfig.ready()),
+    None (the default) disables the instrumentation.
+    """
+    global _instrumentation_sink
+    _instrumentation_sink = sink
+
+
+class BaseInstrumentationSink:
+    """
+    instrumentation sink that times the phases of the nested serializers (format, resolve_lookups,
+    normalize, validate_nested, validate, create, update, m2m, foreign_key, resolve_foreign_keys,
+    instance_validation and representation) and counts their queries, override emit() to send
+    the spans somewhere.
+    """
+    @contextlib.contextmanager
+    def span(self, name, attributes, using=DEFAULT_DB_ALIAS):
+        """
+        context manager around one phase, spans of nested phases run inside it and their time
+        and queries are included in it.
+        """
+        start = time.perf_counter()
+        with self.count_queries(using) as queries:
+            try:
+                yield
+            finally:
+                self.emit(name, attributes, time.perf_counter() - start, queries[0])
+
+    @staticmethod
+    @contextlib.contextmanager
+    def count_queries(using=DEFAULT_DB_ALIAS):
+        """
+        count the queries of the database connection, yields a list with the number of queries.
+        """
+        queries = [0]
+
+        def counter(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        connection = connections[using]
+        connection.execute_wrappers.append(counter)
+        try:
+            yield queries
+        finally:
+            connection.execute_wrappers.remove(counter)
+
+    def emit(self, name, attributes, duration, queries):
+        """
+        :param name: the span name (e.g. "DynamicNestedField.m2m")
+        :param attributes: dict of serializer, model, phase and attribute (for nested attributes)
+        :param duration: the phase time in seconds
+        :param queries: the number of queries of the phase
+        """
+        pass
+
+
+class CallbackInstrumentationSink(BaseInstrumentationSink):
+    """
+    call a function with (name, attributes, duration, queries) for every span.
+    """
+    def __init__(self, callback):
+        self.callback = callback
+
+    def emit(self, name, attributes, duration, queries):
+        self.callback(name, attributes, duration, queries)
+
+
+class LoggingInstrumentationSink(BaseInstrumentationSink):
+    """
+    log every span with the "DynamicNestedField" logger (or the given one).
+    """
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger("DynamicNestedField")
+        self.level = level
+
+    def emit(self, name, attributes, duration, queries):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(
+                self.level, "%s %s %.2f ms %d queries",
+                name, " ".join(f"{key}={value}" for key, value in attributes.items()), duration * 1000, queries
+            )
+
+
+class OpenTelemetryInstrumentationSink(BaseInstrumentationSink):
+    """
+    open a span of an OpenTelemetry-style tracer (anything with start_as_current_span()) for every
+    phase, with the number of queries in the "db.query_count" attribute.
+    """
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    @contextlib.contextmanager
+    def span(self, name, attributes, using=DEFAULT_DB_ALIAS):
+        with self.tracer.start_as_current_span(name, attributes=attributes) as span:
+            with self.count_queries(using) as queries:
+                try:
+                    yield
+                finally:
+                    span.set_attribute("db.query_count", queries[0])
@@ -0,0 +1,4 @@
+import sys
+from .suite import main
+
+sys.exit(main())
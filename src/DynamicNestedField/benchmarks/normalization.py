@@ -0,0 +1,49 @@
+"""
+benchmark of the payload normalization used before validation (remove_none_values).
+
+run it with: python -m DynamicNestedField.benchmarks.normalization [items] [children]
+"""
+import json
+import sys
+import time
+from django.conf import settings
+
+if not settings.configured:  # the benchmark does not use a database.
+    settings.configure()
+
+from ..DynamicNestedField import remove_none_values  # noqa: E402
+
+
+def make_payload(items=5000, children=20):
+    """
+    return a list payload of items like A -> b (m2m) -> c (foreign key) with None values
+    in dicts and lists.
+    """
+    return [
+        {
+            "charfield": f"a{i}",
+            "note": None,
+            "b": [
+                {"charfield": f"b{i}-{j}", "c": {"charfield": "c", "note": None} if j % 2 else None}
+                if j % 5 else None
+                for j in range(children)
+            ],
+        }
+        for i in range(items)
+    ]
+
+
+def run(items=5000, children=20):
+    payload = make_payload(items, children)
+    size = len(json.dumps(payload))
+
+    start = time.perf_counter()
+    remove_none_values(payload)
+    elapsed = time.perf_counter() - start
+
+    print(f"remove_none_values: {size / 1024 / 1024:.2f} MB payload in {elapsed * 1000:.1f} ms")
+    return elapsed
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,136 @@
+"""
+generated A/B/C-style models, serializers and ViewSet used by the benchmarks.
+
+every model has a charfield and a big text field, and each level points to the next one with
+a m2m field on even levels and a foreign key on odd levels (A -> b (m2m) -> c (foreign key) ->
+d (m2m) ...), m2m fields have `fan_out` items in the generated data.
+"""
+import string
+from django.db import connection, models
+from rest_framework.permissions import AllowAny
+from ..DynamicNestedField import DynamicNestedMixin, NestedModelViewSet
+
+TEXT = "x" * 2048  # a wide column that is not asked for by the restql scenarios.
+
+_schemas = {}  # {depth: Schema}
+
+
+class Schema:
+    def __init__(self, depth):
+        if not 2 <= depth <= len(string.ascii_uppercase):
+            raise Exception(f"benchmark depth must be between 2 and {len(string.ascii_uppercase)}")
+        self.depth = depth
+        self.names = [string.ascii_lowercase[level] for level in range(depth)]  # field names: a, b, c...
+        self.models = self.make_models()
+        self.serializers = self.make_serializers()
+        self.viewset = type(NestedModelViewSet)(f"Depth{depth}ViewSet", (NestedModelViewSet,), {
+            "queryset": self.models[0].objects.all(),
+            "serializer_class": self.serializers[0],
+        })
+        # the same ViewSet with a queryset that already prefetches the relations (as many projects do).
+        self.prefetched_viewset = type(NestedModelViewSet)(f"Depth{depth}PrefetchedViewSet", (self.viewset,), {
+            "queryset": self.models[0].objects.prefetch_related("__".join(self.names[1:])),
+        })
+
+    @staticmethod
+    def is_m2m(level):
+        return level % 2 == 0
+
+    def make_models(self):
+        """
+        create the models from the last level to the first one, the model names include the depth
+        so schemas of several depths can be used in one process.
+        """
+        result = []
+        for level in reversed(range(self.depth)):
+            attrs = {
+                "__module__": __name__,
+                "Meta": type("Meta", (), {"app_label": "benchmarks"}),
+                "charfield": models.CharField(max_length=100),
+                "text": models.TextField(default=TEXT),
+            }
+            if result:
+                child, name = result[0], self.names[level + 1]
+                attrs[name] = models.ManyToManyField(child) if self.is_m2m(level) else \
+                    models.ForeignKey(child, on_delete=models.CASCADE, null=True, blank=True)
+            name = f"Depth{self.depth}{self.names[level].upper()}"
+            result.insert(0, type(models.Model)(name, (models.Model,), attrs))
+        return result
+
+    def make_serializers(self):
+        result = []
+        for level in reversed(range(self.depth)):
+            fields = ["id", "charfield", "text"]
+            attrs = {}
+            if result:
+                name = self.names[level + 1]
+                fields.append(name)
+                attrs[name] = result[0](many=self.is_m2m(level), required=False)
+            attrs["Meta"] = type("Meta", (), {
+                "model": self.models[level],
+                "fields": fields,
+                "DNM_config": {name: {"filter": ["id"]} for name in fields[3:]},
+                "permission_classes": [AllowAny],
+            })
+            result.insert(0, type(DynamicNestedMixin)(f"{self.models[level].__name__}Serializer",
+                                                      (DynamicNestedMixin,), attrs))
+        return result
+
+    def create_tables(self):
+        existing = set(connection.introspection.table_names())
+        with connection.schema_editor() as editor:
+            for model in self.models:
+                if model._meta.db_table not in existing:
+                    editor.create_model(model)
+
+    def populate(self, items, fan_out):
+        """
+        create `items` trees with `fan_out` items in every m2m field, returns the root instances.
+        """
+        return [self.create_tree(0, f"{i}", fan_out) for i in range(items)]
+
+    def create_tree(self, level, label, fan_out):
+        model = self.models[level]
+        if level + 1 == self.depth:
+            return model.objects.create(charfield=f"{self.names[level]}{label}")
+        name = self.names[level + 1]
+        if self.is_m2m(level):
+            instance = model.objects.create(charfield=f"{self.names[level]}{label}")
+            getattr(instance, name).add(*[
+                self.create_tree(level + 1, f"{label}-{i}", fan_out) for i in range(fan_out)
+            ])
+            return instance
+        return model.objects.create(
+            charfield=f"{self.names[level]}{label}", **{name: self.create_tree(level + 1, label, fan_out)}
+        )
+
+    def make_data(self, level, label, fan_out):
+        """
+        return a request body that creates a new tree from level.
+        """
+        data = {"charfield": f"{self.names[level]}{label}"}
+        if level + 1 < self.depth:
+            name = self.names[level + 1]
+            data[name] = [self.make_data(level + 1, f"{label}-{i}", fan_out) for i in range(fan_out)] \
+                if self.is_m2m(level) else self.make_data(level + 1, label, fan_out)
+        return data
+
+    def make_query(self, level=0):
+        """
+        return a restql query that asks for the charfield of every level.
+        """
+        if level + 1 == self.depth:
+            return "{charfield}"
+        return f"{{charfield, {self.names[level + 1]}{self.make_query(level + 1)}}}"
+
+    def make_filter(self, value):
+        """
+        return a filter query parameter on the charfield of the last level.
+        """
+        return f"{'__'.join(self.names[1:])}__charfield={value}"
+
+
+def get_schema(depth=3):
+    if depth not in _schemas:
+        _schemas[depth] = Schema(depth)
+    return _schemas[depth]
@@ -0,0 +1,23 @@
+"""
+self-contained django settings used by the benchmarks, the models are generated at run time
+and their tables are created in an in-memory SQLite database.
+"""
+SECRET_KEY = "DynamicNestedField-benchmarks"
+DEBUG = False
+USE_TZ = True
+
+DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}}
+DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
+
+INSTALLED_APPS = [
+    "django.contrib.contenttypes",
+    "django.contrib.auth",
+    "rest_framework",
+    "django_filters",
+    "DynamicNestedField.benchmarks",
+]
+MIDDLEWARE = ["DynamicNestedField.DynamicNestedField.GlobalRequestMiddleware"]
+ROOT_URLCONF = __name__
+urlpatterns = []
+
+REST_FRAMEWORK = {"UNAUTHENTICATED_USER": None}
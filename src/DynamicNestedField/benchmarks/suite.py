@@ -0,0 +1,223 @@
+"""
+benchmark of the nested read and write paths on generated A/B/C-style models.
+
+every scenario sends one request to the ViewSet of the first model and reports its wall time
+(the best of `repeat` runs), its number of queries and its peak memory (traced in one more run).
+
+run it with: python -m DynamicNestedField.benchmarks [--depth 3] [--fan-out 20] [--items 50]
+             [--repeat 3] [--record budgets.json] [--budget budgets.json] [--tolerance 0.25]
+
+--record saves the results as budgets, and --budget fails (exit code 1) when a scenario makes
+more queries than its budget or takes more time or memory than its budget plus the tolerance.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+
+SETTINGS_MODULE = "DynamicNestedField.benchmarks.settings"
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+# the tables of the generated models are created in the configured database, so the bundled
+# in-memory SQLite settings are always used, even when DJANGO_SETTINGS_MODULE is exported.
+if settings.configured:
+    if getattr(settings, "SETTINGS_MODULE", None) != SETTINGS_MODULE:
+        raise Exception(f"the benchmarks must run with {SETTINGS_MODULE}, django is already configured with "
+                        f"{getattr(settings, 'SETTINGS_MODULE', None) or 'settings.configure()'} "
+                        f"(database: {settings.DATABASES.get('default', {}).get('NAME')})")
+else:
+    os.environ["DJANGO_SETTINGS_MODULE"] = SETTINGS_MODULE
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+from ..DynamicNestedField import GlobalRequestMiddleware  # noqa: E402
+from .schema import get_schema  # noqa: E402
+
+METRICS = ("time", "queries", "memory")
+
+
+class Suite:
+    def __init__(self, depth=3, fan_out=20, items=50):
+        self.schema = get_schema(depth)
+        self.fan_out = fan_out
+        self.items = items
+        self.factory = APIRequestFactory()
+        self.runs = 0  # used to give every created tree new values.
+
+    def setup(self):
+        self.schema.create_tables()
+        self.roots = self.schema.populate(self.items, self.fan_out)
+
+    def get_scenarios(self):
+        """
+        return a {name: function} dict, every function builds its request body and returns a
+        (method, path, data, view kwargs[, viewset]) request description.
+        """
+        return OrderedDict([
+            ("post_nested", self.post_nested),
+            ("post_ids", self.post_ids),
+            ("put_nested", self.put_nested),
+            ("patch_ids", self.patch_ids),
+            ("get_list_restql", self.get_list_restql),
+            ("get_list_filtered", self.get_list_filtered),
+            ("get_list_prefetched", self.get_list_prefetched),
+        ])
+
+    def get_child_ids(self, root):
+        name = self.schema.names[1]
+        return list(getattr(root, name).values_list("pk", flat=True))
+
+    def post_nested(self):
+        self.runs += 1
+        return "post", "/", self.schema.make_data(0, f"-new{self.runs}", self.fan_out), {}
+
+    def post_ids(self):
+        return "post", "/", {"charfield": "a-ids", self.schema.names[1]: self.get_child_ids(self.roots[0])}, {}
+
+    def put_nested(self):
+        """
+        send back the whole tree of an instance (as the clients do) with a changed charfield.
+        """
+        self.runs += 1
+        root = self.roots[1 % len(self.roots)]
+        data = json.loads(self.send("get", f"/{root.pk}/", None, {"pk": root.pk}).content)
+        data["charfield"] = f"a-put{self.runs}"
+        return "put", f"/{root.pk}/", data, {"pk": root.pk}
+
+    def patch_ids(self):
+        root = self.roots[2 % len(self.roots)]
+        data = {"id": root.pk, self.schema.names[1]: self.get_child_ids(self.roots[0])}
+        return "patch", f"/{root.pk}/", data, {"pk": root.pk}
+
+    def get_list_restql(self):
+        return "get", f"/?query={self.schema.make_query()}", None, {}
+
+    def get_list_filtered(self):
+        value = self.schema.models[-1].objects.order_by("pk").values_list("charfield", flat=True).first()
+        return "get", f"/?{self.schema.make_filter(value)}", None, {}
+
+    def get_list_prefetched(self):
+        """
+        the query plan of the serializer on a queryset that already prefetches the relations.
+        """
+        return "get", f"/?query={self.schema.make_query()}", None, {}, self.schema.prefetched_viewset
+
+    def send(self, method, path, data, kwargs, viewset=None):
+        actions = {"get": "list", "post": "create"} if not kwargs else \
+            {"get": "retrieve", "put": "update", "patch": "partial_update"}
+        view = (viewset or self.schema.viewset).as_view(actions)
+        request = getattr(self.factory, method)(path, data, format="json") if data is not None else \
+            getattr(self.factory, method)(path)
+        response = GlobalRequestMiddleware(lambda req: view(req, **kwargs))(request)
+        response.render()
+        if response.status_code >= 400:
+            raise Exception(f"{method.upper()} {path} failed with {response.status_code}: {response.content[:500]}")
+        return response
+
+    def measure(self, scenario, repeat=3):
+        result = OrderedDict()
+        for _ in range(max(repeat, 1)):
+            request = scenario()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                self.send(*request)
+                elapsed = time.perf_counter() - start
+            result["time"] = min(result.get("time", elapsed), elapsed)
+            result["queries"] = len(queries.captured_queries)
+
+        request = scenario()
+        tracemalloc.start()
+        try:
+            self.send(*request)
+            result["memory"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return result
+
+    def run(self, repeat=3, names=None):
+        self.setup()
+        return OrderedDict(
+            (name, self.measure(scenario, repeat))
+            for name, scenario in self.get_scenarios().items() if not names or name in names
+        )
+
+
+def check_budgets(results, budgets, tolerance=0.25):
+    """
+    return a list of messages for the results that are over their budgets, the number of
+    queries must not grow and time and memory can grow by the tolerance (0.25 = 25%).
+    """
+    failures = []
+    for name, result in results.items():
+        budget = budgets.get(name, {})
+        for metric in METRICS:
+            if metric not in budget:
+                continue
+            limit = budget[metric] if metric == "queries" else budget[metric] * (1 + tolerance)
+            if result[metric] > limit:
+                failures.append(f"{name}: {metric} {format_metric(metric, result[metric])} "
+                                f"is over the budget {format_metric(metric, budget[metric])}")
+    return failures
+
+
+def format_metric(metric, value):
+    if metric == "time":
+        return f"{value * 1000:.1f} ms"
+    if metric == "memory":
+        return f"{value / 1024 / 1024:.2f} MB"
+    return str(value)
+
+
+def report(results, budgets=None):
+    print(f"{'scenario':<20}{'time':>12}{'queries':>10}{'memory':>12}")
+    for name, result in results.items():
+        line = f"{name:<20}" + "".join(
+            f"{format_metric(metric, result[metric]):>{width}}" for metric, width in zip(METRICS, (12, 10, 12))
+        )
+        if budgets and name in budgets:
+            line += "   budget: " + ", ".join(
+                f"{metric} {format_metric(metric, budgets[name][metric])}" for metric in METRICS if metric in budgets[name]
+            )
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m DynamicNestedField.benchmarks")
+    parser.add_argument("--depth", type=int, default=3, help="number of model levels (default: 3).")
+    parser.add_argument("--fan-out", type=int, default=20, help="items in every m2m field (default: 20).")
+    parser.add_argument("--items", type=int, default=50, help="trees created before the scenarios (default: 50).")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of every scenario, the best time is used.")
+    parser.add_argument("--scenario", action="append", help="run only this scenario (can be repeated).")
+    parser.add_argument("--record", help="save the results as budgets to this json file.")
+    parser.add_argument("--budget", help="fail if the results are over the budgets in this json file.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed time and memory growth (default: 0.25).")
+    args = parser.parse_args(argv)
+
+    results = Suite(args.depth, args.fan_out, max(args.items, 3)).run(args.repeat, args.scenario)
+
+    budgets = None
+    if args.budget:
+        with open(args.budget) as file:
+            budgets = json.load(file)
+    report(results, budgets)
+
+    if args.record:
+        with open(args.record, "w") as file:
+            json.dump(results, file, indent=2)
+
+    failures = check_budgets(results, budgets, args.tolerance) if budgets else []
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())